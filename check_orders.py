@@ -1,7 +1,24 @@
 from mingos.models import CustomerOrder
-from django.db.models import Count
+from mingos.rollups import day_bounds, sales_date
+from django.db.models import Count, Max
+from django.db.models.functions import TruncDate
+from datetime import timedelta
 
-orders_by_date = CustomerOrder.objects.extra({'date': 'DATE(order_datetime)'}).values('date').annotate(count=Count('order_id')).order_by('-date')[:8]
+latest = CustomerOrder.objects.aggregate(latest=Max('order_datetime'))['latest']
+if latest is None:
+    print("No orders yet")
+else:
+    # Half-open range on the raw column so the order_datetime index is used.
+    last_day = sales_date(latest)
+    start, end = day_bounds(last_day - timedelta(days=7), last_day)
+    orders_by_date = (
+        CustomerOrder.objects
+        .filter(order_datetime__gte=start, order_datetime__lt=end)
+        .annotate(date=TruncDate('order_datetime'))
+        .values('date')
+        .annotate(count=Count('order_id'))
+        .order_by('-date')
+    )
 
-for o in orders_by_date:
-    print(f"{o['date']}: {o['count']} orders")
+    for o in orders_by_date:
+        print(f"{o['date']}: {o['count']} orders")
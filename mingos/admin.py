@@ -1,17 +1,115 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .inventory import receive_purchase_orders, record_stock_change
+from .purchasing import confirm_purchase_orders
+from .orders import STATUS_TRANSITIONS, change_order_status
 from .models import (
     Supplier, Ingredient, MenuCategory, MenuItem, 
     CustomerOrder, OrderItem, Recipe, PurchaseOrder, 
-    PurchaseOrderLine, SupplierIngredient
+    PurchaseOrderLine, SupplierIngredient, PendingDeduction,
+    StockLedgerEntry, StockStripe, StockReservation,
+    DailySales, DailyItemSales, ForecastSnapshot
 )
 
+
+@admin.action(description="Mark selected purchase orders as received")
+def mark_received(modeladmin, request, queryset):
+    count = receive_purchase_orders(list(queryset.values_list('pk', flat=True)))
+    modeladmin.message_user(request, f"{count} purchase order(s) received into stock.")
+
+
+@admin.action(description="Confirm selected draft purchase orders")
+def mark_confirmed(modeladmin, request, queryset):
+    count = confirm_purchase_orders(list(queryset.values_list('pk', flat=True)))
+    modeladmin.message_user(request, f"{count} draft purchase order(s) confirmed.")
+
+
+class IngredientAdmin(admin.ModelAdmin):
+    list_display = ('name', 'unit_of_measure', 'current_stock_qty', 'reserved_stock_qty', 'status')
+    readonly_fields = ('reserved_stock_qty',)
+
+    def save_model(self, request, obj, form, change):
+        # Stock edits are booked as an ADJUSTMENT of the difference, and the
+        # rest of the row is saved without the stock column, so orders placed
+        # while the form was open are not overwritten.
+        if not change:
+            return super().save_model(request, obj, form, change)
+        fields = [name for name in form.changed_data if name != 'current_stock_qty']
+        if fields:
+            obj.save(update_fields=fields)
+        if 'current_stock_qty' in form.changed_data:
+            delta = obj.current_stock_qty - form.initial['current_stock_qty']
+            record_stock_change({obj.pk: delta}, 'ADJUSTMENT', notes=f"Admin edit by {request.user}")
+            obj.refresh_from_db(fields=['current_stock_qty'])
+
+
+class StockLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ('entry_id', 'created_at', 'ingredient', 'entry_type', 'quantity_change', 'folded')
+    list_filter = ('entry_type', 'folded')
+    readonly_fields = ('folded', 'created_at')
+
+    # The ledger is append-only: corrections are new ADJUSTMENT entries.
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PurchaseOrderAdmin(admin.ModelAdmin):
+    list_display = ('po_id', 'supplier', 'order_date', 'status', 'total_amount')
+    list_filter = ('status',)
+    actions = [mark_confirmed, mark_received]
+
+
+def _status_action(status):
+    @admin.action(description=f"Mark selected orders as {status.lower()}")
+    def action(modeladmin, request, queryset):
+        moved = change_order_status(list(queryset.values_list('pk', flat=True)), status)
+        modeladmin.message_user(request, f"{len(moved)} order(s) marked {status.lower()}.")
+    action.__name__ = f'mark_{status.lower()}'
+    return action
+
+
+class CustomerOrderAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'order_datetime', 'order_type', 'order_status', 'item_count', 'total_qty', 'total_amount')
+    readonly_fields = ('item_count', 'total_qty')
+    list_filter = ('order_status', 'order_type')
+    actions = [_status_action('PREPARING'), _status_action('SERVED'), _status_action('CANCELLED')]
+
+    def save_model(self, request, obj, form, change):
+        # Status changes only go through change_order_status, so stock is
+        # settled exactly once; moves it does not allow (e.g. back to
+        # PENDING, which would let a cancellation restore stock twice) are
+        # refused rather than saved raw.
+        new_status = obj.order_status
+        status_changed = change and 'order_status' in form.changed_data
+        if status_changed:
+            obj.order_status = form.initial['order_status']
+        super().save_model(request, obj, form, change)
+        if status_changed and (
+            new_status not in STATUS_TRANSITIONS or not change_order_status([obj.pk], new_status)
+        ):
+            self.message_user(
+                request,
+                f"Order #{obj.pk} cannot move from {obj.order_status} to {new_status}.",
+                level=messages.WARNING,
+            )
+
+
 admin.site.register(Supplier)
-admin.site.register(Ingredient)
+admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(MenuCategory)
 admin.site.register(MenuItem)
 admin.site.register(SupplierIngredient)
-admin.site.register(PurchaseOrder)
+admin.site.register(PurchaseOrder, PurchaseOrderAdmin)
 admin.site.register(PurchaseOrderLine)
 admin.site.register(Recipe)
-admin.site.register(CustomerOrder)
+admin.site.register(CustomerOrder, CustomerOrderAdmin)
 admin.site.register(OrderItem)
+admin.site.register(PendingDeduction)
+admin.site.register(StockLedgerEntry, StockLedgerEntryAdmin)
+admin.site.register(StockStripe)
+admin.site.register(StockReservation)
+admin.site.register(DailySales)
+admin.site.register(DailyItemSales)
+admin.site.register(ForecastSnapshot)
@@ -0,0 +1,184 @@
+"""
+Sales analytics over arbitrary date windows.
+
+Window totals come from the running totals (prefix sums) on DailySales:
+the totals up to the window end minus the totals up to the day before the
+window start. Each is one indexed lookup, so the cost does not depend on
+how long the window is.
+"""
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import ExtractIsoWeekDay
+
+from .models import DailyItemSales, DailySales, HourlySales
+from .rollups import RUNNING_FIELDS
+
+PERIODS = (
+    ('last_7_days', 'Last 7 days'),
+    ('last_30_days', 'Last 30 days'),
+    ('this_month', 'This month'),
+    ('last_month', 'Last month'),
+    ('this_quarter', 'This quarter'),
+    ('last_quarter', 'Last quarter'),
+    ('this_year', 'This year'),
+    ('custom', 'Custom range'),
+)
+EARLIEST_DATE = date(1900, 1, 1)
+MAX_CUSTOM_DAYS = 3660  # about ten years, so the window before it stays a valid date range
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+
+def _quarter_start(day):
+    return date(day.year, 3 * ((day.month - 1) // 3) + 1, 1)
+
+
+def period_bounds(period, today):
+    """(start, end) of a named period relative to `today`, both inclusive."""
+    if period == 'last_7_days':
+        return today - timedelta(days=6), today
+    if period == 'last_30_days':
+        return today - timedelta(days=29), today
+    if period == 'this_month':
+        return today.replace(day=1), today
+    if period == 'last_month':
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    if period == 'this_quarter':
+        return _quarter_start(today), today
+    if period == 'last_quarter':
+        end = _quarter_start(today) - timedelta(days=1)
+        return _quarter_start(end), end
+    if period == 'this_year':
+        return date(today.year, 1, 1), today
+    raise ValueError(f"Unknown period {period!r}.")
+
+
+def parse_window(params, today, default='last_7_days'):
+    """
+    Read a window from request parameters: `period` naming one of PERIODS,
+    with `start` and `end` (YYYY-MM-DD) for a custom range of at most
+    MAX_CUSTOM_DAYS days. Falls back to `default` when they are missing,
+    invalid or out of range.
+    Returns (period, start, end).
+    """
+    period = params.get('period') or default
+    try:
+        if period == 'custom':
+            start, end = sorted((date.fromisoformat(params['start']), date.fromisoformat(params['end'])))
+            if start < EARLIEST_DATE:
+                raise ValueError(f"Dates before {EARLIEST_DATE} are not supported.")
+            if (end - start).days >= MAX_CUSTOM_DAYS:
+                raise ValueError(f"Custom ranges are limited to {MAX_CUSTOM_DAYS} days.")
+            if end >= date.max:
+                raise ValueError("The day after the range must be a valid date.")
+        else:
+            start, end = period_bounds(period, today)
+    except (KeyError, ValueError, OverflowError):
+        period = default
+        start, end = period_bounds(period, today)
+    return period, start, end
+
+
+def running_totals(day):
+    """Orders, revenue and items sold over every day up to and including `day`."""
+    row = (
+        DailySales.objects
+        .filter(sales_date__lte=day)
+        .order_by('-sales_date')
+        .values(*RUNNING_FIELDS.values())
+        .first()
+    )
+    return {field: row[cum_field] if row else 0 for field, cum_field in RUNNING_FIELDS.items()}
+
+
+def _difference(upto_end, upto_before_start):
+    return {field: upto_end[field] - upto_before_start[field] for field in RUNNING_FIELDS}
+
+
+def window_totals(start, end):
+    """Orders, revenue and items sold over start..end (inclusive)."""
+    return _difference(running_totals(end), running_totals(start - timedelta(days=1)))
+
+
+def compare_windows(start, end):
+    """
+    Totals of start..end next to those of the equally long window just
+    before it, with the absolute and percentage change of each figure.
+    Costs three running-total lookups whatever the window length.
+    """
+    length = end - start + timedelta(days=1)
+    previous_start, previous_end = start - length, start - timedelta(days=1)
+
+    upto_end = running_totals(end)
+    upto_start = running_totals(previous_end)
+    upto_previous_start = running_totals(previous_start - timedelta(days=1))
+    current = _difference(upto_end, upto_start)
+    previous = _difference(upto_start, upto_previous_start)
+
+    change, change_pct = {}, {}
+    for field in RUNNING_FIELDS:
+        change[field] = current[field] - previous[field]
+        change_pct[field] = round(float(change[field]) / float(previous[field]) * 100, 1) if previous[field] else None
+
+    return {
+        'start': start,
+        'end': end,
+        'previous_start': previous_start,
+        'previous_end': previous_end,
+        'current': current,
+        'previous': previous,
+        'change': change,
+        'change_pct': change_pct,
+    }
+
+
+def daily_series(start, end):
+    """Day labels and revenue per day over start..end, zero-filled."""
+    revenue = dict(
+        DailySales.objects
+        .filter(sales_date__range=(start, end))
+        .values_list('sales_date', 'total_amount')
+    )
+    labels, totals = [], []
+    day = start
+    while day <= end:
+        labels.append(day.strftime('%d %b'))
+        totals.append(float(revenue.get(day, 0)))
+        day += timedelta(days=1)
+    return labels, totals
+
+
+def top_items(start, end, limit=10):
+    """Best-selling menu items by revenue over start..end."""
+    return list(
+        DailyItemSales.objects
+        .filter(sales_date__range=(start, end))
+        .values('menu_item__name')
+        .annotate(total_qty=Sum('quantity'), total_sales=Sum('revenue'))
+        .order_by('-total_sales')[:limit]
+    )
+
+
+def weekday_hour_heatmap(start, end):
+    """
+    Orders, revenue and items sold by weekday and hour of day over
+    start..end, from the hourly rollup (at most 7 x 24 grouped rows).
+    Returns {'weekdays': [...], 'orders': 7x24, 'revenue': 7x24, 'items': 7x24}
+    with Monday first.
+    """
+    rows = (
+        HourlySales.objects
+        .filter(sales_date__range=(start, end))
+        .annotate(weekday=ExtractIsoWeekDay('sales_date'))
+        .values('weekday', 'hour')
+        .annotate(orders=Sum('order_count'), revenue=Sum('total_amount'), items=Sum('item_quantity'))
+    )
+    heatmap = {'weekdays': WEEKDAYS}
+    for measure in ('orders', 'revenue', 'items'):
+        heatmap[measure] = [[0] * 24 for _ in WEEKDAYS]
+    for row in rows:
+        heatmap['orders'][row['weekday'] - 1][row['hour']] = row['orders']
+        heatmap['revenue'][row['weekday'] - 1][row['hour']] = float(row['revenue'])
+        heatmap['items'][row['weekday'] - 1][row['hour']] = row['items']
+    return heatmap
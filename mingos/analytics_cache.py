@@ -0,0 +1,94 @@
+"""
+Versioned cache for analytics page data.
+
+Dashboard and sales analytics contexts are cached under a key carrying a
+global data-version number. Anything that changes what those pages show
+(orders, recipes, stock) bumps the version once its transaction commits,
+so repeated page loads between writes cost one cache read and a cached
+context is never served after the data behind it changed. Old versions
+simply age out of the cache.
+
+The version is a random token, replaced (never incremented) on every
+bump: a version lost to cache eviction, or two bumps racing each other,
+can never bring back a version whose contexts are still cached. It lives
+in the cache named by settings.MINGOS_VERSION_CACHE (default 'default'),
+which must be shared by all workers so a bump in one worker process
+reaches the others.
+"""
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+VERSION_KEY = 'mingos:data-version'
+ENTRY_TIMEOUT = 24 * 60 * 60
+
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'rebuild_seconds': 0.0, 'last_rebuild_seconds': None}
+
+
+def _versions():
+    return caches[getattr(settings, 'MINGOS_VERSION_CACHE', 'default')]
+
+
+def data_version():
+    versions = _versions()
+    version = versions.get(VERSION_KEY)
+    if version is None:
+        fresh = uuid4().hex
+        versions.add(VERSION_KEY, fresh, None)
+        version = versions.get(VERSION_KEY, fresh)
+    return version
+
+
+def _bump():
+    # A plain set rather than incr(): incr is read-modify-write on most
+    # backends, so two racing bumps could both write the same next number.
+    _versions().set(VERSION_KEY, uuid4().hex, None)
+
+
+def data_changed():
+    """Bump the data version when the current transaction commits."""
+    transaction.on_commit(_bump)
+
+
+def get_or_build(name, builder):
+    """
+    Return the cached value of `name` for the current data version and
+    day (date-relative series roll over at midnight), building it with
+    `builder()` on a miss.
+    """
+    key = f'mingos:analytics:{name}:{data_version()}:{timezone.localdate()}'
+    value = cache.get(key)
+    if value is not None:
+        with _lock:
+            _stats['hits'] += 1
+        return value
+
+    started = time.perf_counter()
+    value = builder()
+    elapsed = time.perf_counter() - started
+    cache.set(key, value, ENTRY_TIMEOUT)
+    with _lock:
+        _stats['misses'] += 1
+        _stats['rebuild_seconds'] += elapsed
+        _stats['last_rebuild_seconds'] = round(elapsed, 4)
+    return value
+
+
+def stats():
+    """Hit rate and rebuild time of this process's lookups."""
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else None,
+            'avg_rebuild_seconds': round(_stats['rebuild_seconds'] / _stats['misses'], 4) if _stats['misses'] else None,
+            'last_rebuild_seconds': _stats['last_rebuild_seconds'],
+            'data_version': _versions().get(VERSION_KEY),
+        }
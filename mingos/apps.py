@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MingosConfig(AppConfig):
     name = 'mingos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,102 @@
+"""
+Compiled bill-of-materials cache.
+
+Maps menu_item_id to a tuple of (ingredient_id, quantity_required) pairs so
+the order path does not re-read Recipe rows for every order. Entries are
+compiled lazily, kept per process, and validated against a version token
+stored in Django's cache so that a recipe edit made in one worker process
+invalidates the entry in every other one (settings.CACHES must be shared
+by the workers). As a backstop, entries are also recompiled once they are
+older than settings.MINGOS_BOM_TTL_SECONDS (default 60).
+"""
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Recipe
+
+_lock = threading.Lock()
+_entries = {}  # menu_item_id -> (version token, bom tuple, compiled at)
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def ttl_seconds():
+    return getattr(settings, 'MINGOS_BOM_TTL_SECONDS', 60)
+
+
+def _version_key(menu_item_id):
+    return f'mingos:bom:{menu_item_id}'
+
+
+def _current_versions(menu_item_ids):
+    """Return {menu_item_id: version token}, creating tokens that are missing."""
+    keys = {pk: _version_key(pk) for pk in menu_item_ids}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for pk, key in keys.items():
+        token = found.get(key)
+        if token is None:
+            token = uuid4().hex
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+        versions[pk] = token
+    return versions
+
+
+def get_boms(menu_item_ids):
+    """
+    Return {menu_item_id: ((ingredient_id, quantity_required), ...)} for the
+    given menu items. Missing or stale entries are compiled with one query.
+    """
+    versions = _current_versions(set(menu_item_ids))
+    boms = {}
+    oldest = time.monotonic() - ttl_seconds()
+    with _lock:
+        for pk, token in versions.items():
+            entry = _entries.get(pk)
+            if entry is not None and entry[0] == token and entry[2] > oldest:
+                boms[pk] = entry[1]
+        _stats['hits'] += len(boms)
+        _stats['misses'] += len(versions) - len(boms)
+
+    missing = [pk for pk in versions if pk not in boms]
+    if missing:
+        compiled = {pk: [] for pk in missing}
+        rows = (
+            Recipe.objects
+            .filter(menu_item_id__in=missing)
+            .order_by('menu_item_id', 'ingredient_id')
+            .values_list('menu_item_id', 'ingredient_id', 'quantity_required')
+        )
+        for menu_item_id, ingredient_id, quantity_required in rows:
+            compiled[menu_item_id].append((ingredient_id, quantity_required))
+
+        compiled_at = time.monotonic()
+        with _lock:
+            for pk, pairs in compiled.items():
+                boms[pk] = tuple(pairs)
+                _entries[pk] = (versions[pk], boms[pk], compiled_at)
+
+    return boms
+
+
+def invalidate(menu_item_id):
+    """Drop the compiled BOM of one menu item in this and every other process."""
+    cache.set(_version_key(menu_item_id), uuid4().hex, None)
+    with _lock:
+        _entries.pop(menu_item_id, None)
+        _stats['invalidations'] += 1
+
+
+def stats():
+    """Hit/miss counters of this process's cache."""
+    with _lock:
+        lookups = _stats['hits'] + _stats['misses']
+        return {
+            **_stats,
+            'entries': len(_entries),
+            'hit_rate': round(_stats['hits'] / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,318 @@
+"""
+In-process sales cube.
+
+Quantity and revenue are held as dense NumPy arrays indexed by
+menu item x day x hour x order type, covering the last
+settings.MINGOS_SALES_CUBE_DAYS days (default 180). The cube is built from
+the database on first use, fed directly by orders placed in this process
+as they commit, and topped up from the database every few seconds with
+orders placed by other processes. Orders cancelled in this process are
+taken back out as they commit; cancelled orders are never loaded. Slices,
+roll-ups and drill-downs are then array reductions that run no query.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .analytics import WEEKDAYS
+from .models import CustomerOrder, MenuItem, OrderItem
+from .rollups import day_bounds, sales_date, sales_hour
+
+ORDER_TYPES = [code for code, label in CustomerOrder.ORDER_TYPES]
+DIMENSIONS = ('item', 'category', 'day', 'weekday', 'hour', 'order_type')
+MEASURES = ('quantity', 'revenue')
+REFRESH_SECONDS = 5
+HEADROOM_DAYS = 31  # days past the build date the cube can take before a rebuild
+RESCAN_MARGIN = 1000  # order ids re-read in case a lower id commits after a higher one
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()  # one rebuild at a time, reading the database without _lock
+_cube = None
+_missed = None  # feeds that arrive while a rebuild runs, replayed on the new cube
+
+
+def cube_days():
+    return getattr(settings, 'MINGOS_SALES_CUBE_DAYS', 180)
+
+
+def _order_lines(lines):
+    """OrderItem rows as the tuples SalesCube.add() and remove() take."""
+    return lines.values_list(
+        'customer_order_id', 'customer_order__order_datetime', 'customer_order__order_type',
+        'menu_item_id', 'quantity', 'line_amount',
+    )
+
+
+class SalesCube:
+    def __init__(self, first_day, days):
+        self.first_day = first_day
+        self.days = days
+        self.item_ids = []
+        self.item_index = {}
+        self.item_names = {}
+        self.item_categories = {}
+        shape = (0, days, 24, len(ORDER_TYPES))
+        self.quantity = np.zeros(shape, dtype=np.int32)
+        self.revenue = np.zeros(shape, dtype=np.float64)
+        self.watermark = 0
+        self.seen_ids = set()  # orders counted in the cube
+        self.refreshed_at = time.monotonic()
+
+    @property
+    def last_day(self):
+        return self.first_day + timedelta(days=self.days - 1)
+
+    def _load_items(self, item_ids=None):
+        """(Re)read names and categories, growing the item axis for new items."""
+        items = MenuItem.objects.select_related('category')
+        if item_ids is not None:
+            items = items.filter(pk__in=item_ids)
+        new_ids = []
+        for item in items.only('pk', 'name', 'category__name'):
+            self.item_names[item.pk] = item.name
+            self.item_categories[item.pk] = item.category.name if item.category_id else 'Uncategorized'
+            if item.pk not in self.item_index:
+                self.item_index[item.pk] = len(self.item_ids)
+                self.item_ids.append(item.pk)
+                new_ids.append(item.pk)
+        if new_ids:
+            extra = (len(new_ids),) + self.quantity.shape[1:]
+            self.quantity = np.concatenate([self.quantity, np.zeros(extra, dtype=self.quantity.dtype)])
+            self.revenue = np.concatenate([self.revenue, np.zeros(extra, dtype=self.revenue.dtype)])
+
+    def add(self, rows):
+        """
+        Add order lines given as
+        (order_id, order_datetime, order_type, menu_item_id, quantity, line_amount)
+        tuples. Orders already added are skipped, as are lines outside the
+        cube's days. Returns the number of lines added.
+        """
+        rows = [row for row in rows if row[0] not in self.seen_ids]
+        if not rows:
+            return 0
+        missing = {row[3] for row in rows} - self.item_index.keys()
+        if missing:
+            self._load_items(missing)
+
+        order_ids = {row[0] for row in rows}
+        self.watermark = max(self.watermark, max(order_ids))
+        self.seen_ids |= order_ids
+        return self._apply(rows, 1)
+
+    def remove(self, rows):
+        """
+        Take the lines of cancelled orders, given as for add(), back out.
+        Orders the cube never counted are skipped. Returns the number of
+        lines removed.
+        """
+        rows = [row for row in rows if row[0] in self.seen_ids]
+        self.seen_ids -= {row[0] for row in rows}
+        return self._apply(rows, -1)
+
+    def _apply(self, rows, sign):
+        type_index = {code: i for i, code in enumerate(ORDER_TYPES)}
+        cells, quantities, amounts = [], [], []
+        for order_id, dt, order_type, menu_item_id, qty, amount in rows:
+            day = (sales_date(dt) - self.first_day).days
+            if 0 <= day < self.days and menu_item_id in self.item_index and order_type in type_index:
+                cells.append((self.item_index[menu_item_id], day, sales_hour(dt), type_index[order_type]))
+                quantities.append(sign * qty)
+                amounts.append(sign * float(amount))
+        if cells:
+            index = tuple(np.array(cells).T)
+            np.add.at(self.quantity, index, quantities)
+            np.add.at(self.revenue, index, amounts)
+        return len(cells)
+
+    def load_all(self):
+        self._load_items()
+        lo, hi = day_bounds(self.first_day, self.last_day)
+        self.watermark = CustomerOrder.objects.aggregate(m=Max('order_id'))['m'] or 0
+        self.add(_order_lines(OrderItem.objects.filter(
+            customer_order__order_datetime__gte=lo, customer_order__order_datetime__lt=hi,
+        ).exclude(customer_order__order_status='CANCELLED')).iterator(chunk_size=5000))
+
+    def refresh(self):
+        """Pick up orders committed by other processes since the last refresh."""
+        self._load_items()
+        self.add(_order_lines(OrderItem.objects.filter(
+            customer_order_id__gt=self.watermark - RESCAN_MARGIN,
+        ).exclude(customer_order__order_status='CANCELLED')).iterator(chunk_size=5000))
+        self.refreshed_at = time.monotonic()
+
+    def _selection(self, start, end, items, categories, hours, order_types):
+        item_idx = np.arange(len(self.item_ids))
+        if items:
+            item_idx = np.array([self.item_index[pk] for pk in items if pk in self.item_index], dtype=int)
+        if categories:
+            item_idx = np.array([i for i in item_idx if self.item_categories[self.item_ids[i]] in categories], dtype=int)
+        first = 0 if start is None else max(0, (start - self.first_day).days)
+        last = self.days - 1 if end is None else min(self.days - 1, (end - self.first_day).days)
+        day_idx = np.arange(first, last + 1)
+        hour_idx = np.array(sorted(set(hours)), dtype=int) if hours else np.arange(24)
+        type_idx = (
+            np.array([ORDER_TYPES.index(code) for code in order_types], dtype=int)
+            if order_types else np.arange(len(ORDER_TYPES))
+        )
+        return item_idx, day_idx, hour_idx, type_idx
+
+    def query(self, measure='revenue', group_by=('item',), start=None, end=None,
+              items=None, categories=None, hours=None, order_types=None, limit=1000):
+        """
+        Sum `measure` over the selected cells, grouped by `group_by` (any of
+        DIMENSIONS, at most one of item/category and one of day/weekday).
+        Returns (rows, total): rows are dicts with one key per grouping
+        dimension plus `value`, largest first, at most `limit` of them.
+        """
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure {measure!r}.")
+        unknown = set(group_by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown dimension(s): {', '.join(sorted(unknown))}.")
+        if {'item', 'category'} <= set(group_by) or {'day', 'weekday'} <= set(group_by):
+            raise ValueError("Group by item or category, and by day or weekday, not both.")
+        if hours and not set(hours) <= set(range(24)):
+            raise ValueError("Hours must be between 0 and 23.")
+        if order_types and set(order_types) - set(ORDER_TYPES):
+            raise ValueError(f"Unknown order type(s): {', '.join(sorted(set(order_types) - set(ORDER_TYPES)))}.")
+
+        item_idx, day_idx, hour_idx, type_idx = self._selection(start, end, items, categories, hours, order_types)
+        data = getattr(self, measure)[np.ix_(item_idx, day_idx, hour_idx, type_idx)]
+
+        # Each axis is either kept, mapped onto coarser groups by a 0/1
+        # matrix (item -> category, day -> weekday), or summed away.
+        axes = []
+        item_ids = [self.item_ids[i] for i in item_idx]
+        days = [self.first_day + timedelta(days=int(d)) for d in day_idx]
+        for keep, coarse, members, labels_of in (
+            ('item', 'category', item_ids, lambda pk: self.item_categories[pk]),
+            ('day', 'weekday', days, lambda day: WEEKDAYS[day.weekday()]),
+        ):
+            if keep in group_by:
+                axes.append((keep, members, None))
+            elif coarse in group_by:
+                labels = sorted({labels_of(m) for m in members}, key=str)
+                if coarse == 'weekday':
+                    labels = [w for w in WEEKDAYS if w in labels]
+                position = {label: i for i, label in enumerate(labels)}
+                matrix = np.zeros((len(labels), len(members)))
+                matrix[[position[labels_of(m)] for m in members], np.arange(len(members))] = 1
+                axes.append((coarse, labels, matrix))
+            else:
+                axes.append((None, None, None))
+        axes.append(('hour', [int(h) for h in hour_idx], None) if 'hour' in group_by else (None, None, None))
+        axes.append(
+            ('order_type', [ORDER_TYPES[t] for t in type_idx], None) if 'order_type' in group_by else (None, None, None)
+        )
+
+        for axis, (name, labels, matrix) in reversed(list(enumerate(axes))):
+            if name is None:
+                data = data.sum(axis=axis)
+            elif matrix is not None:
+                data = np.moveaxis(np.tensordot(matrix, data, axes=([1], [axis])), 0, axis)
+        kept = [(name, labels) for name, labels, matrix in axes if name is not None]
+
+        total = int(data.sum()) if measure == 'quantity' else round(float(data.sum()), 2)
+        if not kept:
+            return [], total
+        flat = data.ravel()
+        nonzero = np.flatnonzero(flat)
+        order = nonzero[np.argsort(-flat[nonzero], kind='stable')][:limit]
+        rows = []
+        for cell, position in zip(order, zip(*np.unravel_index(order, data.shape))):
+            row = {}
+            for (name, labels), i in zip(kept, position):
+                label = labels[i]
+                if name == 'item':
+                    row['item_id'] = label
+                    row['item'] = self.item_names.get(label)
+                elif name == 'day':
+                    row['day'] = label.isoformat()
+                else:
+                    row[name] = label
+            row['value'] = int(flat[cell]) if measure == 'quantity' else round(float(flat[cell]), 2)
+            rows.append(row)
+        return rows, total
+
+
+def _stale(cube, today):
+    return cube is None or today > cube.last_day or cube.days != cube_days() + HEADROOM_DAYS
+
+
+def _current_cube():
+    """
+    The process's cube: built on first use, rebuilt once today runs past
+    it, else refreshed. A rebuild reads the database without holding
+    _lock, so orders committing meanwhile are not held up behind it; what
+    they feed in is replayed on the new cube.
+    """
+    global _cube, _missed
+    today = timezone.localdate()
+    with _lock:
+        if not _stale(_cube, today):
+            if time.monotonic() - _cube.refreshed_at > REFRESH_SECONDS:
+                _cube.refresh()
+            return _cube
+
+    with _build_lock:
+        with _lock:
+            if not _stale(_cube, today):
+                return _cube
+            _missed = []
+        cube = SalesCube(today - timedelta(days=cube_days() - 1), cube_days() + HEADROOM_DAYS)
+        try:
+            cube.load_all()
+        finally:
+            with _lock:
+                missed, _missed = _missed, None
+        with _lock:
+            for apply, rows in missed:
+                apply(cube, rows)
+            _cube = cube
+        return cube
+
+
+def query(**kwargs):
+    """Run SalesCube.query on this process's cube. Returns (cube first day, rows, total)."""
+    cube = _current_cube()
+    with _lock:
+        rows, total = cube.query(**kwargs)
+        return cube.first_day, rows, total
+
+
+def _feed(apply, rows):
+    with _lock:
+        if _missed is not None:
+            _missed.append((apply, rows))
+        if _cube is not None:
+            apply(_cube, rows)
+
+
+def _listening():
+    return _cube is not None or _missed is not None
+
+
+def orders_placed(orders, order_items):
+    """Feed newly placed orders to this process's cube, if one is built, once they commit."""
+    if not _listening():
+        return
+    rows = [
+        (order.pk, order.order_datetime, order.order_type, item.menu_item_id, item.quantity, item.line_amount)
+        for order, items in zip(orders, order_items)
+        for item in items
+    ]
+    transaction.on_commit(lambda: _feed(SalesCube.add, rows))
+
+
+def orders_cancelled(order_ids):
+    """Take cancelled orders back out of this process's cube, if one is built, once the cancellation commits."""
+    if not _listening():
+        return
+    rows = list(_order_lines(OrderItem.objects.filter(customer_order_id__in=order_ids)))
+    transaction.on_commit(lambda: _feed(SalesCube.remove, rows))
@@ -0,0 +1,203 @@
+"""
+Next-day sales forecasts for every menu item at once.
+
+The last HISTORY_DAYS days of DailyItemSales are pivoted into a dense
+item x day quantity matrix, with days an item did not sell filled in as
+zeros. A degree-2 polynomial trend is fitted to every row with one
+least-squares solve (the design matrix is shared, each item is one
+right-hand side), so the cost is a single query plus a few small matrix
+products whatever the size of the menu.
+
+The precompute_forecasts command stores the predictions in
+ForecastSnapshot; pages read the latest snapshot and only compute live
+when there is none for today or tomorrow.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from . import analytics_cache
+from .models import DailyItemSales, ForecastSnapshot
+
+HISTORY_DAYS = 30
+DEGREE = 2
+MIN_SALES_DAYS = 3  # fewer days with sales than this and the average is used instead
+
+
+def sales_matrix(start, end):
+    """
+    Quantities sold per menu item and day over start..end (inclusive), for
+    items that sold at least once. Returns (item_ids, names, matrix) with
+    matrix[i, d] the quantity of item_ids[i] sold on start + d days.
+    """
+    rows = list(
+        DailyItemSales.objects
+        .filter(sales_date__range=(start, end), quantity__gt=0)
+        .values_list('menu_item_id', 'menu_item__name', 'sales_date', 'quantity')
+    )
+    names = {item_id: name for item_id, name, day, qty in rows}
+    item_ids = sorted(names)
+    index = {item_id: i for i, item_id in enumerate(item_ids)}
+    matrix = np.zeros((len(item_ids), (end - start).days + 1))
+    if rows:
+        np.add.at(
+            matrix,
+            ([index[row[0]] for row in rows], [(row[2] - start).days for row in rows]),
+            [row[3] for row in rows],
+        )
+    return item_ids, names, matrix
+
+
+def polynomial_forecast(matrix, degree=DEGREE, steps=1):
+    """
+    Fit a polynomial trend of `degree` to each row of `matrix` (one series
+    per row, oldest first) and return each row's value `steps` days past
+    its last column.
+    """
+    days = matrix.shape[1]
+    x = np.arange(days) / days  # scaled so the normal equations stay well conditioned
+    design = np.vander(x, degree + 1, increasing=True)
+    coefficients = np.linalg.lstsq(design, matrix.T, rcond=None)[0]
+    target = np.vander([(days - 1 + steps) / days], degree + 1, increasing=True)
+    return (target @ coefficients)[0]
+
+
+def predict_next_day(today=None):
+    """
+    Predict tomorrow's quantity of every menu item sold in the last
+    HISTORY_DAYS days (up to and including `today`). Returns
+    {menu_item_id: {'name', 'predicted_qty', 'confidence', 'avg_daily_sales'}}.
+    """
+    today = today or timezone.localdate()
+    item_ids, names, matrix = sales_matrix(today - timedelta(days=HISTORY_DAYS - 1), today)
+    if not item_ids:
+        return {}
+
+    trend = np.maximum(0, np.rint(polynomial_forecast(matrix)))
+    average = matrix.mean(axis=1)
+    enough = np.count_nonzero(matrix, axis=1) >= MIN_SALES_DAYS
+    predicted = np.where(enough, trend, np.rint(average))
+
+    return {
+        item_id: {
+            'name': names[item_id],
+            'predicted_qty': int(predicted[i]),
+            'confidence': 'high' if enough[i] else 'low',
+            'avg_daily_sales': int(round(average[i])),
+        }
+        for i, item_id in enumerate(item_ids)
+    }
+
+
+@transaction.atomic
+def save_snapshot(today=None):
+    """
+    Store predict_next_day(today) as the ForecastSnapshot rows of the day
+    after `today`, replacing any earlier snapshot of that day.
+    Returns (forecast date, number of items).
+    """
+    today = today or timezone.localdate()
+    forecast_date = today + timedelta(days=1)
+    predictions = predict_next_day(today)
+    ForecastSnapshot.objects.filter(forecast_date=forecast_date).delete()
+    ForecastSnapshot.objects.bulk_create([
+        ForecastSnapshot(
+            forecast_date=forecast_date,
+            menu_item_id=item_id,
+            predicted_qty=prediction['predicted_qty'],
+            confidence=prediction['confidence'],
+            avg_daily_sales=prediction['avg_daily_sales'],
+        )
+        for item_id, prediction in predictions.items()
+    ])
+    analytics_cache.data_changed()
+    return forecast_date, len(predictions)
+
+
+def next_day_predictions(today=None):
+    """
+    Next-day predictions in the predict_next_day format, from the newest
+    snapshot for tomorrow or, failing that, today (what a nightly run after
+    yesterday's close stores). Computed live only when neither exists.
+    """
+    today = today or timezone.localdate()
+    latest = (
+        ForecastSnapshot.objects
+        .filter(forecast_date__range=(today, today + timedelta(days=1)))
+        .order_by('-forecast_date')
+        .values('forecast_date')[:1]
+    )
+    rows = (
+        ForecastSnapshot.objects
+        .filter(forecast_date=Subquery(latest))
+        .values_list('menu_item_id', 'menu_item__name', 'predicted_qty', 'confidence', 'avg_daily_sales')
+    )
+    predictions = {
+        item_id: {'name': name, 'predicted_qty': qty, 'confidence': confidence, 'avg_daily_sales': average}
+        for item_id, name, qty, confidence, average in rows
+    }
+    return predictions or predict_next_day(today)
+
+
+# Forecasters compared by the backtest_forecasts command. Each takes an
+# item x day history matrix and the date of its first column, and returns
+# every item's prediction for the day after the last column.
+
+def poly2_forecast(history, start):
+    """The dashboard forecast: a degree-2 trend over the whole history."""
+    return polynomial_forecast(history, degree=2)
+
+
+def moving_average_forecast(history, start, days=7):
+    return history[:, -days:].mean(axis=1)
+
+
+def same_weekday_forecast(history, start):
+    """What sold on the same weekday a week before."""
+    return history[:, -7]
+
+
+def weekday_seasonal_forecast(history, start):
+    """A linear trend plus one offset per weekday, fitted to all items in one solve."""
+    days = history.shape[1]
+    weekdays = (start.weekday() + np.arange(days + 1)) % 7
+    design = np.column_stack(
+        [np.ones(days + 1), np.arange(days + 1) / days] + [weekdays == day for day in range(1, 7)]
+    ).astype(float)
+    coefficients = np.linalg.lstsq(design[:-1], history.T, rcond=None)[0]
+    return design[-1] @ coefficients
+
+
+FORECASTERS = {
+    'poly2': poly2_forecast,
+    'moving_average': moving_average_forecast,
+    'same_weekday': same_weekday_forecast,
+    'weekday_seasonal': weekday_seasonal_forecast,
+}
+
+
+def backtest_errors(matrix, start, window):
+    """
+    Rolling-origin evaluation over `matrix` (items x days, column 0 being
+    `start`): each day from column `window` on is predicted, as the
+    dashboard would (rounded, never negative), from the `window` days
+    before it. Returns {forecaster: (absolute error, percentage error,
+    days with sales)}, each an array per item summed over the predicted days.
+    """
+    items, days = matrix.shape
+    totals = {name: (np.zeros(items), np.zeros(items), np.zeros(items)) for name in FORECASTERS}
+    for target in range(window, days):
+        history = matrix[:, target - window:target]
+        actual = matrix[:, target]
+        sold = actual > 0
+        history_start = start + timedelta(days=target - window)
+        for name, forecast in FORECASTERS.items():
+            abs_error, pct_error, sold_days = totals[name]
+            error = np.abs(np.maximum(0, np.rint(forecast(history, history_start))) - actual)
+            abs_error += error
+            pct_error += np.where(sold, error / np.where(sold, actual, 1), 0) * 100
+            sold_days += sold
+    return totals
@@ -0,0 +1,456 @@
+from collections import defaultdict
+from decimal import Decimal
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, DecimalField, Sum, Count, Min
+from django.utils.timezone import localdate, now
+
+from . import analytics_cache, bom
+from .retry import atomic_with_retry
+from .models import (
+    Ingredient, OrderConsumption, OrderItem, PendingDeduction, PurchaseOrder, PurchaseOrderLine,
+    StockLedgerEntry, StockStripe, StockReservation,
+)
+
+HOT_INGREDIENTS_TTL = 60  # seconds
+
+_hot_ingredients = {'ids': frozenset(), 'loaded_at': None}
+_striped_ingredients = set()  # ingredients whose stripe rows are known to exist
+
+
+def deferred_deduction_enabled():
+    return getattr(settings, 'MINGOS_DEFERRED_DEDUCTION', False)
+
+
+def stock_ledger_enabled():
+    return getattr(settings, 'MINGOS_STOCK_LEDGER', False)
+
+
+def stock_reservation_enabled():
+    return getattr(settings, 'MINGOS_RESERVE_STOCK', False)
+
+
+def stock_stripe_count():
+    return getattr(settings, 'MINGOS_STOCK_STRIPES', 8)
+
+
+def hot_ingredient_ids():
+    """
+    Ids of ingredients flagged is_hot, reloaded at most once a minute.
+    A stale answer only changes where a deduction is counted, never the
+    total, because stock reads sum the stripes with the main row.
+    """
+    loaded_at = _hot_ingredients['loaded_at']
+    if loaded_at is None or time.monotonic() - loaded_at > HOT_INGREDIENTS_TTL:
+        _hot_ingredients['ids'] = frozenset(
+            Ingredient.objects.filter(is_hot=True).values_list('pk', flat=True)
+        )
+        _hot_ingredients['loaded_at'] = time.monotonic()
+    return _hot_ingredients['ids']
+
+
+def recipe_consumption(lines, boms=None):
+    """
+    Expand order lines into the ingredient quantities they consume.
+    `lines` is a dict: {menu_item_id: quantity}
+    `boms` optionally passes compiled BOMs already fetched from the cache.
+    Returns a dict: {ingredient_id: Decimal quantity}
+    """
+    if boms is None:
+        boms = bom.get_boms(lines)
+    consumption = defaultdict(Decimal)
+    for menu_item_id, qty in lines.items():
+        for ingredient_id, quantity_required in boms[menu_item_id]:
+            consumption[ingredient_id] += quantity_required * qty
+    return dict(consumption)
+
+
+def lock_ingredients(ingredient_ids):
+    """
+    Lock Ingredient rows with one SELECT ... FOR UPDATE, always in primary
+    key order, so transactions touching overlapping ingredients queue up
+    instead of deadlocking. Must run inside a transaction.
+    """
+    return list(
+        Ingredient.objects
+        .select_for_update()
+        .filter(pk__in=sorted(ingredient_ids))
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def apply_stock_deltas(deltas, field='current_stock_qty'):
+    """
+    Add signed quantities to Ingredient.current_stock_qty (or to another
+    quantity column such as reserved_stock_qty).
+    `deltas` is a dict: {ingredient_id: Decimal change}, negative to deduct.
+    Every ingredient is updated by a single combined UPDATE statement,
+    after locking the affected rows in primary key order.
+    """
+    deltas = {pk: qty for pk, qty in deltas.items() if qty}
+    if not deltas:
+        return 0
+
+    lock_ingredients(deltas)
+    delta = Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in sorted(deltas.items())],
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    analytics_cache.data_changed()
+    return (
+        Ingredient.objects
+        .filter(pk__in=list(deltas))
+        .update(**{field: F(field) + delta})
+    )
+
+
+def deduct_for_orders(consumption_by_order, entry_type='ORDER'):
+    """
+    Take the ingredients consumed by orders out of inventory.
+    `consumption_by_order` is a list of (order_id, {ingredient_id: quantity});
+    negative quantities put stock back.
+
+    In ledger mode (settings.MINGOS_STOCK_LEDGER) one StockLedgerEntry is
+    appended per order and ingredient. In deferred mode
+    (settings.MINGOS_DEFERRED_DEDUCTION) PendingDeduction rows are inserted
+    and the drain_deductions worker applies them later. Either way the order
+    transaction never locks Ingredient rows. Otherwise the summed
+    consumption is deducted right away. Outside ledger mode, order
+    deductions are also recorded as OrderConsumption rows, so that
+    restore_order_stock() can give back exactly what was taken.
+    """
+    if stock_ledger_enabled():
+        StockLedgerEntry.objects.bulk_create([
+            StockLedgerEntry(
+                ingredient_id=ingredient_id,
+                entry_type=entry_type,
+                quantity_change=-qty,
+                reference_order_id=order_id,
+            )
+            for order_id, consumption in consumption_by_order
+            for ingredient_id, qty in consumption.items()
+            if qty
+        ])
+        return
+
+    if entry_type == 'ORDER':
+        OrderConsumption.objects.bulk_create([
+            OrderConsumption(customer_order_id=order_id, ingredient_id=ingredient_id, quantity=qty)
+            for order_id, consumption in consumption_by_order
+            for ingredient_id, qty in consumption.items()
+            if qty
+        ])
+
+    if deferred_deduction_enabled():
+        PendingDeduction.objects.bulk_create([
+            PendingDeduction(customer_order_id=order_id, ingredient_id=ingredient_id, quantity=qty)
+            for order_id, consumption in consumption_by_order
+            for ingredient_id, qty in consumption.items()
+            if qty
+        ])
+        return
+
+    totals = defaultdict(Decimal)
+    for order_id, consumption in consumption_by_order:
+        for ingredient_id, qty in consumption.items():
+            totals[ingredient_id] -= qty
+    apply_order_deltas(totals)
+
+
+def reserve_for_orders(consumption_by_order):
+    """
+    Hold the ingredients of newly placed orders instead of deducting them
+    (settings.MINGOS_RESERVE_STOCK): one StockReservation row per order and
+    ingredient, and one combined UPDATE of reserved_stock_qty. The
+    ingredient rows stay locked until the order commits, which includes the
+    sales rollup statements place_orders runs after this one.
+    `consumption_by_order` is a list of (order_id, {ingredient_id: quantity}).
+    """
+    totals = defaultdict(Decimal)
+    reservations = []
+    for order_id, consumption in consumption_by_order:
+        for ingredient_id, qty in consumption.items():
+            if qty:
+                totals[ingredient_id] += qty
+                reservations.append(
+                    StockReservation(customer_order_id=order_id, ingredient_id=ingredient_id, quantity=qty)
+                )
+    StockReservation.objects.bulk_create(reservations)
+    apply_stock_deltas(totals, field='reserved_stock_qty')
+
+
+def settle_reservations(order_ids, served):
+    """
+    Close the reservations of orders leaving the open states, as one set
+    operation however many orders are given: served orders have their held
+    quantities deducted from stock, cancelled ones only release them.
+    Returns the ids of the orders that had reservations.
+    """
+    rows = list(
+        StockReservation.objects
+        .filter(customer_order_id__in=order_ids)
+        .values_list('customer_order_id', 'ingredient_id', 'quantity')
+    )
+    if not rows:
+        return []
+
+    released = defaultdict(Decimal)
+    by_order = defaultdict(dict)
+    for order_id, ingredient_id, qty in rows:
+        released[ingredient_id] -= qty
+        by_order[order_id][ingredient_id] = qty
+
+    apply_stock_deltas(released, field='reserved_stock_qty')
+    if served:
+        deduct_for_orders(list(by_order.items()))
+    StockReservation.objects.filter(customer_order_id__in=list(by_order)).delete()
+    return list(by_order)
+
+
+def apply_order_deltas(deltas):
+    """
+    Apply order-driven stock changes right away. Hot ingredients go to one
+    of their StockStripe rows, chosen by worker process and thread, so
+    concurrent cashiers rarely wait on the same row; the rest are applied
+    to Ingredient rows with apply_stock_deltas.
+    """
+    hot_ids = hot_ingredient_ids()
+    hot = {pk: qty for pk, qty in deltas.items() if pk in hot_ids and qty}
+    apply_stock_deltas({pk: qty for pk, qty in deltas.items() if pk not in hot})
+    if not hot:
+        return
+
+    unseen = set(hot) - _striped_ingredients
+    if unseen:
+        # First deduction of these ingredients in this process: make sure
+        # all of their stripe rows exist before updating one of them.
+        StockStripe.objects.bulk_create(
+            [
+                StockStripe(ingredient_id=pk, stripe_no=n)
+                for pk in unseen
+                for n in range(stock_stripe_count())
+            ],
+            ignore_conflicts=True,
+        )
+        transaction.on_commit(lambda: _striped_ingredients.update(unseen))
+
+    stripe_no = hash((os.getpid(), threading.get_ident())) % stock_stripe_count()
+    delta = Case(
+        *[When(ingredient_id=pk, then=Value(qty)) for pk, qty in sorted(hot.items())],
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    StockStripe.objects.filter(stripe_no=stripe_no, ingredient_id__in=list(hot)).update(
+        quantity=F('quantity') + delta
+    )
+
+
+@atomic_with_retry
+def fold_stock_stripes():
+    """
+    Merge the stripe counters of hot ingredients back into
+    Ingredient.current_stock_qty and reset them to zero.
+    Returns the number of ingredients folded.
+    """
+    stripes = list(
+        StockStripe.objects
+        .select_for_update()
+        .exclude(quantity=0)
+        .order_by('ingredient_id', 'stripe_no')
+        .values_list('pk', 'ingredient_id', 'quantity')
+    )
+    if not stripes:
+        return 0
+
+    totals = defaultdict(Decimal)
+    for pk, ingredient_id, qty in stripes:
+        totals[ingredient_id] += qty
+    apply_stock_deltas(totals)
+    StockStripe.objects.filter(pk__in=[stripe[0] for stripe in stripes]).update(quantity=0)
+    return len(totals)
+
+
+def _deducted_for_orders(order_ids):
+    """
+    What the stock deductions of orders took, as {order_id: {ingredient_id:
+    quantity}}: their ORDER ledger entries, else their OrderConsumption
+    rows. Orders with neither (placed before consumption was recorded) fall
+    back to their lines times the current recipes.
+    """
+    by_order = defaultdict(lambda: defaultdict(Decimal))
+    ledger = (
+        StockLedgerEntry.objects
+        .filter(reference_order_id__in=order_ids, entry_type='ORDER')
+        .values_list('reference_order_id', 'ingredient_id', 'quantity_change')
+    )
+    for order_id, ingredient_id, qty in ledger:
+        by_order[order_id][ingredient_id] -= qty
+
+    recorded = (
+        OrderConsumption.objects
+        .filter(customer_order_id__in=[pk for pk in order_ids if pk not in by_order])
+        .values_list('customer_order_id', 'ingredient_id', 'quantity')
+    )
+    for order_id, ingredient_id, qty in recorded:
+        by_order[order_id][ingredient_id] += qty
+
+    legacy = [pk for pk in order_ids if pk not in by_order]
+    if legacy:
+        rows = (
+            OrderItem.objects
+            .filter(customer_order_id__in=legacy, menu_item__recipe_items__isnull=False)
+            .values('customer_order_id', 'menu_item__recipe_items__ingredient_id')
+            .annotate(qty=Sum(
+                F('quantity') * F('menu_item__recipe_items__quantity_required'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ))
+        )
+        for row in rows:
+            by_order[row['customer_order_id']][row['menu_item__recipe_items__ingredient_id']] += row['qty']
+    return by_order
+
+
+def restore_order_stock(order_ids):
+    """
+    Give back the ingredients of cancelled orders whose stock had already
+    been deducted (or queued for deduction): exactly what their deduction
+    recorded, whatever the recipes say now. The inverse consumption goes
+    through the same path as deductions, so in direct mode every ingredient
+    is restored by a single combined UPDATE.
+    """
+    if not order_ids:
+        return 0
+    by_order = _deducted_for_orders(order_ids)
+    inverse = [
+        (order_id, {ingredient_id: -qty for ingredient_id, qty in consumption.items()})
+        for order_id, consumption in by_order.items()
+    ]
+    deduct_for_orders(inverse, entry_type='ORDER_CANCELLED')
+    return len(by_order)
+
+
+def record_stock_change(deltas, entry_type, reference_po=None, notes=''):
+    """
+    Apply stock changes that do not come from orders (purchase receipts,
+    manual adjustments): appended to the ledger in ledger mode, otherwise
+    applied to current_stock_qty directly.
+    `deltas` is a dict: {ingredient_id: Decimal change}
+    """
+    if not stock_ledger_enabled():
+        return apply_stock_deltas(deltas)
+    analytics_cache.data_changed()
+    StockLedgerEntry.objects.bulk_create([
+        StockLedgerEntry(
+            ingredient_id=ingredient_id,
+            entry_type=entry_type,
+            quantity_change=qty,
+            reference_po=reference_po,
+            notes=notes,
+        )
+        for ingredient_id, qty in deltas.items()
+        if qty
+    ])
+    return len(deltas)
+
+
+@atomic_with_retry
+def receive_purchase_orders(po_ids):
+    """
+    Mark purchase orders as delivered and book the still-outstanding line
+    quantities into stock. Already delivered orders, and drafts not yet
+    placed with the supplier, are left alone.
+    Returns the number of purchase orders received.
+    """
+    pos = list(
+        PurchaseOrder.objects
+        .select_for_update()
+        .filter(pk__in=po_ids)
+        .exclude(status__in=('Delivered', 'Draft'))
+        .order_by('pk')
+    )
+    if not pos:
+        return 0
+
+    lines = PurchaseOrderLine.objects.filter(purchase_order__in=pos, received_qty__lt=F('ordered_qty'))
+    deltas_by_po = defaultdict(lambda: defaultdict(Decimal))
+    for line in lines.values('purchase_order_id', 'ingredient_id', 'ordered_qty', 'received_qty'):
+        deltas_by_po[line['purchase_order_id']][line['ingredient_id']] += line['ordered_qty'] - line['received_qty']
+
+    for po in pos:
+        record_stock_change(deltas_by_po[po.pk], 'PURCHASE', reference_po=po, notes=f'PO #{po.pk} received')
+    lines.update(received_qty=F('ordered_qty'))
+    PurchaseOrder.objects.filter(pk__in=[po.pk for po in pos]).update(
+        status='Delivered', received_date=localdate()
+    )
+    return len(pos)
+
+
+@atomic_with_retry
+def compact_stock_ledger(limit=50000):
+    """
+    Fold up to `limit` unfolded ledger entries, oldest first, into
+    Ingredient.current_stock_qty, which then serves as each ingredient's
+    snapshot: reading stock costs the ingredient row plus the short
+    unfolded tail. Entries locked by a concurrent compaction are skipped.
+    Returns (entries folded, ingredients updated).
+    """
+    entries = list(
+        StockLedgerEntry.objects
+        .select_for_update(skip_locked=True)
+        .filter(folded=False)
+        .order_by('entry_id')
+        .values_list('entry_id', 'ingredient_id', 'quantity_change')[:limit]
+    )
+    if not entries:
+        return 0, 0
+
+    totals = defaultdict(Decimal)
+    for _, ingredient_id, qty in entries:
+        totals[ingredient_id] += qty
+
+    apply_stock_deltas(totals)
+    StockLedgerEntry.objects.filter(entry_id__in=[entry[0] for entry in entries]).update(folded=True)
+    return len(entries), len(totals)
+
+
+@atomic_with_retry
+def drain_pending_deductions(limit=5000):
+    """
+    Apply up to `limit` queued deductions, coalesced so that every
+    ingredient is updated once however many orders used it.
+    Rows locked by a concurrent drain are skipped.
+    Returns (rows drained, ingredients updated).
+    """
+    ids = list(
+        PendingDeduction.objects
+        .select_for_update(skip_locked=True)
+        .order_by('pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return 0, 0
+
+    totals = (
+        PendingDeduction.objects
+        .filter(pk__in=ids)
+        .values('ingredient_id')
+        .annotate(total=Sum('quantity'))
+    )
+    updated = apply_stock_deltas({row['ingredient_id']: -row['total'] for row in totals})
+    PendingDeduction.objects.filter(pk__in=ids).delete()
+    return len(ids), updated
+
+
+def pending_deduction_stats():
+    """Depth of the deferred deduction queue and the age of its oldest row."""
+    stats = PendingDeduction.objects.aggregate(depth=Count('pk'), oldest=Min('created_at'))
+    lag = (now() - stats['oldest']).total_seconds() if stats['oldest'] else 0.0
+    return {
+        "depth": stats['depth'],
+        "oldest": stats['oldest'].isoformat() if stats['oldest'] else None,
+        "lag_seconds": round(lag, 3),
+    }
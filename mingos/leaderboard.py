@@ -0,0 +1,214 @@
+"""
+Live top-selling items over sliding windows.
+
+Quantities sold are counted in one-minute buckets. For each window (15, 60
+and 240 minutes) a running total per menu item is kept together with a
+max-heap of (total, item) entries; totals change when an order arrives or
+a bucket slides out of the window, and every change pushes a fresh heap
+entry in O(log n). Entries whose total is out of date are skipped (and
+dropped) when the top items are read, and the heap is rebuilt when stale
+entries pile up.
+
+Like the sales cube, the board is loaded from the database on first use
+in each worker, fed by orders placed in the worker as they commit, and
+topped up every few seconds with orders placed by other workers. Orders
+cancelled in the worker are taken back out of their minute as they commit;
+cancelled orders are never loaded.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CustomerOrder, MenuItem, OrderItem
+
+WINDOWS = (15, 60, 240)  # minutes
+REFRESH_SECONDS = 5
+RESCAN_MARGIN = 1000  # order ids re-read in case a lower id commits after a higher one
+
+_lock = threading.Lock()
+_board = None
+
+
+def _minute(dt):
+    return int(dt.timestamp() // 60)
+
+
+class Leaderboard:
+    def __init__(self, windows=WINDOWS):
+        self.windows = tuple(sorted(windows))
+        self.buckets = {}  # minute -> Counter(menu_item_id -> quantity)
+        self.totals = {w: Counter() for w in self.windows}
+        self.heaps = {w: [] for w in self.windows}
+        self.now_minute = _minute(timezone.now())
+        self.names = {}
+        self.watermark = 0
+        self.counted = {}  # order id -> minute, for orders counted in the longest window
+        self.refreshed_at = time.monotonic()
+
+    def _set(self, window, item_id, total):
+        if total:
+            self.totals[window][item_id] = total
+        else:
+            self.totals[window].pop(item_id, None)
+        heapq.heappush(self.heaps[window], (-total, item_id))
+
+    def advance(self, now_minute):
+        """Slide every window forward to end at `now_minute`."""
+        if now_minute <= self.now_minute:
+            return
+        for window in self.windows:
+            # Minutes leaving this window; no bucket is newer than the old now.
+            for minute in range(self.now_minute - window + 1, min(now_minute - window, self.now_minute) + 1):
+                for item_id, qty in self.buckets.get(minute, {}).items():
+                    self._set(window, item_id, self.totals[window][item_id] - qty)
+        oldest = now_minute - self.windows[-1] + 1
+        for minute in [m for m in self.buckets if m < oldest]:
+            del self.buckets[minute]
+        self.counted = {pk: minute for pk, minute in self.counted.items() if minute >= oldest}
+        self.now_minute = now_minute
+
+    def add(self, rows):
+        """
+        Count order lines given as (order_id, order_datetime, menu_item_id,
+        quantity) tuples. Orders already counted, and lines older than the
+        longest window, are skipped.
+        """
+        rows = [row for row in rows if row[0] not in self.counted]
+        if not rows:
+            return
+        self.watermark = max(self.watermark, max(row[0] for row in rows))
+
+        for order_id, dt, item_id, qty in rows:
+            # Clock skew between workers must not put a sale in the future.
+            minute = min(_minute(dt), self.now_minute)
+            if minute <= self.now_minute - self.windows[-1]:
+                continue
+            self.counted[order_id] = minute
+            self.buckets.setdefault(minute, Counter())[item_id] += qty
+            for window in self.windows:
+                if minute > self.now_minute - window:
+                    self._set(window, item_id, self.totals[window][item_id] + qty)
+
+    def remove(self, rows):
+        """
+        Take the lines of cancelled orders, given as for add(), back out of
+        the minute they were counted in. Orders not (or no longer) counted
+        are skipped.
+        """
+        for order_id, dt, item_id, qty in rows:
+            minute = self.counted.get(order_id)
+            if minute is None:
+                continue
+            self.buckets[minute][item_id] -= qty
+            for window in self.windows:
+                if minute > self.now_minute - window:
+                    self._set(window, item_id, self.totals[window][item_id] - qty)
+        for row in rows:
+            self.counted.pop(row[0], None)
+
+    def top(self, window, k=5):
+        """The `k` best-selling (menu_item_id, quantity) pairs of the last `window` minutes."""
+        heap, totals = self.heaps[window], self.totals[window]
+        if len(heap) > 4 * len(totals) + 64:
+            self.heaps[window] = heap = [(-total, item_id) for item_id, total in totals.items()]
+            heapq.heapify(heap)
+
+        best, kept = [], []
+        while heap and len(best) < k:
+            entry = heapq.heappop(heap)
+            total, item_id = -entry[0], entry[1]
+            if total and totals.get(item_id) == total and item_id not in {pk for pk, _ in best}:
+                best.append((item_id, total))
+                kept.append(entry)
+        for entry in kept:
+            heapq.heappush(heap, entry)
+        return best
+
+    def _lines(self, orders):
+        return OrderItem.objects.filter(customer_order__in=orders).values_list(
+            'customer_order_id', 'customer_order__order_datetime', 'menu_item_id', 'quantity',
+        )
+
+    def _since(self):
+        return timezone.now() - timedelta(minutes=self.windows[-1])
+
+    def load(self):
+        self.watermark = CustomerOrder.objects.aggregate(m=Max('order_id'))['m'] or 0
+        self.add(self._lines(
+            CustomerOrder.objects.filter(order_datetime__gte=self._since()).exclude(order_status='CANCELLED')
+        ))
+
+    def refresh(self):
+        """Pick up orders committed by other workers since the last refresh."""
+        self.names = {}
+        self.add(self._lines(CustomerOrder.objects.filter(
+            order_id__gt=self.watermark - RESCAN_MARGIN, order_datetime__gte=self._since(),
+        ).exclude(order_status='CANCELLED')))
+        self.refreshed_at = time.monotonic()
+
+    def item_names(self, item_ids):
+        missing = set(item_ids) - self.names.keys()
+        if missing:
+            self.names.update(MenuItem.objects.filter(pk__in=missing).values_list('pk', 'name'))
+        return {pk: self.names.get(pk) for pk in item_ids}
+
+
+def _current_board():
+    """The worker's board: loaded on first use, else refreshed and slid to now. Call with _lock held."""
+    global _board
+    if _board is None:
+        board = Leaderboard()
+        board.load()
+        _board = board
+    else:
+        _board.advance(_minute(timezone.now()))
+        if time.monotonic() - _board.refreshed_at > REFRESH_SECONDS:
+            _board.refresh()
+    return _board
+
+
+def top_items(window, k=5):
+    """
+    The `k` best-selling menu items of the last `window` minutes (one of
+    WINDOWS), as dicts with menu_item_id, name and quantity.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Window must be one of {', '.join(map(str, WINDOWS))} minutes.")
+    with _lock:
+        board = _current_board()
+        best = board.top(window, k)
+        names = board.item_names([item_id for item_id, _ in best])
+    return [{'menu_item_id': item_id, 'name': names[item_id], 'quantity': qty} for item_id, qty in best]
+
+
+def _feed(apply, rows):
+    with _lock:
+        if _board is not None:
+            _board.advance(_minute(timezone.now()))
+            apply(_board, rows)
+
+
+def orders_placed(orders, order_items):
+    """Count newly placed orders on this worker's board, if one is loaded, once they commit."""
+    if _board is None:
+        return
+    rows = [
+        (order.pk, order.order_datetime, item.menu_item_id, item.quantity)
+        for order, items in zip(orders, order_items)
+        for item in items
+    ]
+    transaction.on_commit(lambda: _feed(Leaderboard.add, rows))
+
+
+def orders_cancelled(order_ids):
+    """Take cancelled orders back off this worker's board, if one is loaded, once the cancellation commits."""
+    if _board is None:
+        return
+    rows = list(_board._lines(CustomerOrder.objects.filter(pk__in=order_ids)))
+    transaction.on_commit(lambda: _feed(Leaderboard.remove, rows))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from mingos.models import CustomerOrder
+from mingos.orders import refresh_order_summaries
+
+
+class Command(BaseCommand):
+    help = 'Fill the item_count and total_qty columns of existing orders from their lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Orders updated per statement, by order id range (default: 5000)')
+
+    def handle(self, *args, **options):
+        last_id = CustomerOrder.objects.aggregate(m=Max('order_id'))['m'] or 0
+        step = max(1, options['batch_size'])
+        updated = 0
+        # Short id-range UPDATEs keep each statement's row locks brief.
+        for first_id in range(1, last_id + 1, step):
+            updated += refresh_order_summaries(
+                CustomerOrder.objects.filter(order_id__gte=first_id, order_id__lt=first_id + step)
+            )
+        self.stdout.write(self.style.SUCCESS(f'Filled order summaries of {updated} orders'))
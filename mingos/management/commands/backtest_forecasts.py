@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import django
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from mingos import forecasting
+from mingos.models import DailyItemSales
+
+
+def _backtest_chunk(task):
+    return forecasting.backtest_errors(*task)
+
+
+class Command(BaseCommand):
+    help = 'Compare forecasters by replaying sales history with rolling-origin evaluation (MAE and MAPE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help='First day to predict, YYYY-MM-DD (default: 365 days before --end)')
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help='Last day to predict, YYYY-MM-DD (default: last day with sales)')
+        parser.add_argument('--window', type=int, default=forecasting.HISTORY_DAYS,
+                            help=f'Days of history each prediction uses (default: {forecasting.HISTORY_DAYS})')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes the predicted days are spread over (default: CPU count)')
+
+    def handle(self, *args, **options):
+        window = options['window']
+        if window < 14:
+            raise CommandError('--window must be at least 14 days (two weeks for the weekday baselines).')
+        bounds = DailyItemSales.objects.aggregate(first=Min('sales_date'), last=Max('sales_date'))
+        if bounds['first'] is None:
+            raise CommandError('No sales history to backtest.')
+        end = options['end'] or bounds['last']
+        start = max(options['start'] or end - timedelta(days=364), bounds['first'] + timedelta(days=window))
+        if start > end:
+            raise CommandError(f'Need at least {window} days of history before the first predicted day.')
+
+        item_ids, names, matrix = forecasting.sales_matrix(start - timedelta(days=window), end)
+        days = (end - start).days + 1
+
+        # Each chunk carries the `window` days of history its first target needs.
+        workers = max(1, min(options['workers'], days))
+        step = -(-days // workers)
+        tasks = [
+            (matrix[:, offset:offset + window + min(step, days - offset)], start - timedelta(days=window - offset), window)
+            for offset in range(0, days, step)
+        ]
+        self.stdout.write(
+            f'Backtesting {len(item_ids)} items over {days} days ({start} to {end}) in {len(tasks)} process(es)...'
+        )
+        if len(tasks) > 1:
+            with ProcessPoolExecutor(len(tasks), initializer=django.setup) as executor:
+                results = list(executor.map(_backtest_chunk, tasks))
+        else:
+            results = [_backtest_chunk(task) for task in tasks]
+
+        totals = {
+            name: [sum(result[name][i] for result in results) for i in range(3)]
+            for name in forecasting.FORECASTERS
+        }
+
+        def mape(pct_error, sold_days):
+            return f'{pct_error / sold_days:9.1f}%' if sold_days else f'{"-":>10}'
+
+        header = f'{"Item":30}' + ''.join(f'{name:>22}' for name in totals)
+        self.stdout.write('\nMAE / MAPE per item')
+        self.stdout.write(header)
+        for i, item_id in enumerate(item_ids):
+            self.stdout.write(f'{names[item_id][:30]:30}' + ''.join(
+                f'{abs_error[i] / days:12.2f}{mape(pct_error[i], sold_days[i])}'
+                for abs_error, pct_error, sold_days in totals.values()
+            ))
+
+        self.stdout.write('\nAggregate')
+        summary = {}
+        for name, (abs_error, pct_error, sold_days) in totals.items():
+            mae = abs_error.sum() / (days * len(item_ids)) if item_ids else 0.0
+            summary[name] = mae
+            self.stdout.write(f'{name:30}  MAE {mae:8.2f}  MAPE {mape(pct_error.sum(), sold_days.sum()).strip()}')
+        if item_ids:
+            best = min(summary, key=summary.get)
+            best_items = np.argmin(np.array([totals[name][0] for name in totals]), axis=0)
+            self.stdout.write(self.style.SUCCESS(
+                f'\nLowest MAE overall: {best}. Best per item: ' + ', '.join(
+                    f'{name} {int(np.count_nonzero(best_items == k))}' for k, name in enumerate(totals)
+                )
+            ))
@@ -0,0 +1,257 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, F, Max, Sum
+from django.test import Client
+from mingos import retry
+from mingos.inventory import deferred_deduction_enabled, drain_pending_deductions
+from mingos.models import CustomerOrder, Ingredient, MenuItem, OrderItem, Recipe
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections import Counter
+from decimal import Decimal
+from http.cookiejar import CookieJar
+import multiprocessing
+import numpy as np
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def _basket_model():
+    """
+    Menu items weighted by historical popularity, plus the historical
+    distribution of lines per order and quantity per line.
+    """
+    items = list(
+        MenuItem.objects
+        .filter(is_available=True, recipe_items__isnull=False)
+        .distinct()
+        .values_list('pk', flat=True)
+    )
+    popularity = dict(
+        OrderItem.objects
+        .values('menu_item_id')
+        .annotate(qty=Sum('quantity'))
+        .values_list('menu_item_id', 'qty')
+    )
+    weights = [popularity.get(pk, 0) + 1 for pk in items]
+
+    lines_per_order = list(
+        OrderItem.objects.values('customer_order_id').annotate(n=Count('pk')).values_list('n', flat=True)[:5000]
+    ) or [1, 2, 2, 3, 3, 4]
+    qty_per_line = list(OrderItem.objects.values_list('quantity', flat=True)[:5000]) or [1, 1, 1, 2, 2, 3]
+
+    return {
+        'items': items,
+        'weights': weights,
+        'lines_per_order': lines_per_order,
+        'qty_per_line': qty_per_line,
+    }
+
+
+def _random_basket(model, rng):
+    size = min(rng.choice(model['lines_per_order']), len(model['items']))
+    basket = {}
+    while len(basket) < size:
+        pk = rng.choices(model['items'], weights=model['weights'])[0]
+        basket[pk] = rng.choice(model['qty_per_line'])
+    return basket
+
+
+def _run_worker(job):
+    """Place `job['orders']` orders and return latencies and outcomes."""
+    rng = random.Random(job['seed'])
+    before = retry.stats()
+    latencies, outcomes = [], Counter()
+
+    if job['url']:
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+        form_url = job['url'].rstrip('/') + '/order/new/'
+        page = opener.open(form_url).read().decode()
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    else:
+        client = Client(SERVER_NAME=job['host'])
+
+    try:
+        for _ in range(job['orders']):
+            fields = {f'item_{pk}': str(qty) for pk, qty in _random_basket(job['model'], rng).items()}
+            started = time.perf_counter()
+            if job['url']:
+                fields['csrfmiddlewaretoken'] = token
+                request = urllib.request.Request(
+                    form_url, data=urllib.parse.urlencode(fields).encode(), headers={'Referer': form_url}
+                )
+                try:
+                    status = opener.open(request).status
+                except urllib.error.HTTPError as exc:
+                    status = exc.code
+            else:
+                try:
+                    status = client.post('/order/new/', fields).status_code
+                except Exception:
+                    status = 500
+            latencies.append(time.perf_counter() - started)
+            outcomes['ok' if status == 302 else f'http_{status}'] += 1
+    finally:
+        connection.close()
+
+    after = retry.stats()
+    return {
+        'latencies': latencies,
+        'outcomes': outcomes,
+        'retry': {key: after[key] - before[key] for key in after},
+    }
+
+
+def _mysql_lock_counters():
+    if connection.vendor != 'mysql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_time', 'Innodb_row_lock_waits')")
+        return {name: int(value) for name, value in cursor.fetchall()}
+
+
+def _stock_levels():
+    # Available stock moves by the recipe consumption whether orders deduct or reserve it.
+    return dict(Ingredient.objects.with_stock().values_list('pk', 'available_qty'))
+
+
+class Command(BaseCommand):
+    help = 'Drive create_order with concurrent simulated cashiers and report throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=20,
+                            help='Concurrent cashiers (default: 20)')
+        parser.add_argument('--orders', type=int, default=50,
+                            help='Orders placed by each cashier (default: 50)')
+        parser.add_argument('--processes', action='store_true',
+                            help='Run cashiers as processes instead of threads')
+        parser.add_argument('--url', default='',
+                            help='Base URL of a running server, e.g. http://127.0.0.1:8000 '
+                                 '(default: call the view in process through the test client)')
+        parser.add_argument('--host', default='localhost',
+                            help='Host header used by the in-process test client (default: localhost)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--yes-write-to-db', action='store_true',
+                            help='Confirm that the orders, stock deductions and sales rollups written '
+                                 'by the benchmark may stay in this database')
+
+    def handle(self, *args, **options):
+        # Cashiers commit on their own connections (or in the server behind
+        # --url), so the run cannot be rolled back: point it at a scratch copy.
+        if not options['yes_write_to_db']:
+            target = options['url'] or f"database {connection.settings_dict['NAME']!r}"
+            raise CommandError(
+                f'This places real orders through {target} and deducts their stock. '
+                'Run it against a disposable copy and pass --yes-write-to-db.'
+            )
+        model = _basket_model()
+        if not model['items']:
+            raise CommandError('No available menu items with recipes. Run populate_full_data first.')
+
+        workers = options['workers']
+        jobs = [
+            {
+                'orders': options['orders'],
+                'seed': options['seed'] + n,
+                'url': options['url'],
+                'host': options['host'],
+                'model': model,
+            }
+            for n in range(workers)
+        ]
+
+        self.stdout.write(
+            f"Placing {workers * options['orders']} orders from {workers} concurrent "
+            f"{'processes' if options['processes'] else 'threads'} "
+            f"({'HTTP ' + options['url'] if options['url'] else 'in-process test client'})..."
+        )
+
+        last_order_id = CustomerOrder.objects.aggregate(m=Max('order_id'))['m'] or 0
+        stock_before = _stock_levels()
+        locks_before = _mysql_lock_counters()
+        retries_before = retry.stats()
+
+        if options['processes']:
+            connections.close_all()
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'))
+        else:
+            executor = ThreadPoolExecutor(workers)
+        started = time.perf_counter()
+        with executor:
+            results = list(executor.map(_run_worker, jobs))
+        elapsed = time.perf_counter() - started
+
+        locks_after = _mysql_lock_counters()
+        latencies = np.array([lat for result in results for lat in result['latencies']]) * 1000
+        outcomes = sum((result['outcomes'] for result in results), Counter())
+        if options['processes']:
+            retries = Counter()
+            for result in results:
+                retries.update(result['retry'])
+        else:
+            # Threads share this process's counters.
+            retries = Counter({key: value - retries_before[key] for key, value in retry.stats().items()})
+
+        self.stdout.write(self.style.SUCCESS('\n=== Order Path Benchmark ==='))
+        self.stdout.write(f"Orders placed:   {outcomes['ok']} ok, {sum(outcomes.values()) - outcomes['ok']} failed "
+                          f"{dict(outcomes)}")
+        self.stdout.write(f'Elapsed:         {elapsed:.2f}s')
+        self.stdout.write(f"Throughput:      {outcomes['ok'] / elapsed:.1f} orders/s")
+        self.stdout.write(
+            f'Latency (ms):    p50 {np.percentile(latencies, 50):.1f}  '
+            f'p95 {np.percentile(latencies, 95):.1f}  p99 {np.percentile(latencies, 99):.1f}  '
+            f'max {latencies.max():.1f}'
+        )
+        if options['url']:
+            self.stdout.write('Retries:         see /metrics/ of the server process(es)')
+        else:
+            self.stdout.write(
+                f"Retries:         {retries['retries']} retried, {retries['deadlocks']} deadlocks, "
+                f"{retries['lock_timeouts']} lock timeouts, {retries['gave_up']} gave up"
+            )
+        if locks_before and locks_after:
+            waits = locks_after['Innodb_row_lock_waits'] - locks_before['Innodb_row_lock_waits']
+            wait_ms = locks_after['Innodb_row_lock_time'] - locks_before['Innodb_row_lock_time']
+            self.stdout.write(f'Row lock waits:  {waits} waits, {wait_ms} ms total')
+
+        self._check_stock(last_order_id, stock_before)
+
+    def _check_stock(self, last_order_id, stock_before):
+        """Compare the available stock movement with the recipe consumption of the orders placed."""
+        if deferred_deduction_enabled():
+            while drain_pending_deductions()[0]:
+                pass
+
+        expected = dict(
+            Recipe.objects
+            .filter(menu_item__orderitem__customer_order_id__gt=last_order_id)
+            .values('ingredient_id')
+            .annotate(used=Sum(F('quantity_required') * F('menu_item__orderitem__quantity')))
+            .values_list('ingredient_id', 'used')
+        )
+        stock_after = _stock_levels()
+
+        mismatches = []
+        for pk, before in stock_before.items():
+            used = Decimal(expected.get(pk) or 0)
+            if before - used != stock_after.get(pk):
+                mismatches.append((pk, before - used, stock_after.get(pk)))
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'Stock check:     {len(mismatches)} ingredients inconsistent'))
+            for pk, wanted, actual in mismatches[:10]:
+                self.stdout.write(f'  ingredient {pk}: expected {wanted}, found {actual}')
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Stock check:     {len(expected)} ingredients match expected recipe consumption'
+            ))
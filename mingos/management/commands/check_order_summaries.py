@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from mingos.models import CustomerOrder
+from mingos.orders import order_summary_mismatches, refresh_order_summaries
+
+
+class Command(BaseCommand):
+    help = 'Verify the item_count and total_qty columns of orders against their lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Orders checked per query, by order id range (default: 5000)')
+        parser.add_argument('--fix', action='store_true',
+                            help='Recompute the summaries of mismatched orders')
+
+    def handle(self, *args, **options):
+        last_id = CustomerOrder.objects.aggregate(m=Max('order_id'))['m'] or 0
+        step = max(1, options['batch_size'])
+        mismatched = []
+        for first_id in range(1, last_id + 1, step):
+            batch = CustomerOrder.objects.filter(order_id__gte=first_id, order_id__lt=first_id + step)
+            for order in order_summary_mismatches(batch):
+                self.stdout.write(
+                    f'Order #{order.pk}: stored {order.item_count} items / {order.total_qty} qty, '
+                    f'lines say {order.actual_item_count} / {order.actual_total_qty}'
+                )
+                mismatched.append(order.pk)
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS(f'Order summaries of all orders up to #{last_id} are consistent'))
+        elif options['fix']:
+            fixed = refresh_order_summaries(CustomerOrder.objects.filter(pk__in=mismatched))
+            self.stdout.write(self.style.SUCCESS(f'Fixed order summaries of {fixed} orders'))
+        else:
+            raise CommandError(f'{len(mismatched)} order(s) have stale summaries; rerun with --fix to repair them.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from mingos.inventory import compact_stock_ledger
+
+
+class Command(BaseCommand):
+    help = 'Fold stock ledger entries into ingredient stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help='Ledger entries folded per transaction (default: 50000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Compacting stock ledger...')
+
+        total_entries = 0
+        total_ingredients = 0
+        while True:
+            entries, ingredients = compact_stock_ledger(options['batch_size'])
+            total_entries += entries
+            total_ingredients += ingredients
+            if entries < options['batch_size']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Folded {total_entries} ledger entries into {total_ingredients} ingredients'
+        ))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mingos.inventory import drain_pending_deductions, pending_deduction_stats
+import time
+
+
+class Command(BaseCommand):
+    help = 'Apply deferred inventory deductions, coalesced per ingredient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty (default: 2)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Maximum queued rows applied per drain cycle (default: 5000)')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue once and exit instead of looping')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Draining deferred inventory deductions...')
+
+        try:
+            while True:
+                stats = pending_deduction_stats()
+                drained, ingredients = drain_pending_deductions(options['batch_size'])
+
+                if drained:
+                    self.stdout.write(
+                        f"Applied {drained} pending rows to {ingredients} ingredients "
+                        f"(queue depth {stats['depth']}, lag {stats['lag_seconds']:.1f}s)"
+                    )
+
+                if options['once']:
+                    if drained < options['batch_size']:
+                        break
+                    continue
+                if drained < options['batch_size']:
+                    close_old_connections()
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Deduction worker stopped'))
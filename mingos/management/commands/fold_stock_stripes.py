@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from mingos.inventory import fold_stock_stripes
+import time
+
+
+class Command(BaseCommand):
+    help = 'Merge striped stock counters of hot ingredients back into Ingredient rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between folds (default: 5)')
+        parser.add_argument('--once', action='store_true',
+                            help='Fold once and exit instead of looping')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Folding striped stock counters...')
+
+        try:
+            while True:
+                folded = fold_stock_stripes()
+                if folded:
+                    self.stdout.write(f'Folded stripes of {folded} ingredients')
+                if options['once']:
+                    break
+                close_old_connections()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS('Stripe folding stopped'))
@@ -1,3 +1,4 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from mingos.models import (
     MenuCategory, MenuItem, Ingredient, Recipe, 
@@ -245,6 +246,8 @@ class Command(BaseCommand):
             # Create order
             order = CustomerOrder.objects.create(
                 total_amount=total_amount,
+                item_count=len(order_items_data),
+                total_qty=sum(quantity for _, quantity, _ in order_items_data),
                 order_status=random.choice(['PENDING', 'COMPLETED', 'COMPLETED', 'COMPLETED']),  # 75% completed
                 order_datetime=order_date
             )
@@ -260,6 +263,7 @@ class Command(BaseCommand):
                 )
         
         self.stdout.write(self.style.SUCCESS(f'Successfully created 100 orders'))
+        call_command('rebuild_sales_rollups', stdout=self.stdout)
         
         # Summary
         self.stdout.write(self.style.SUCCESS('\n=== Data Population Complete ==='))
@@ -1,3 +1,4 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from mingos.models import (
     MenuCategory, MenuItem, Ingredient, Recipe, 
@@ -605,6 +606,8 @@ class Command(BaseCommand):
                 # Create order
                 order = CustomerOrder(
                     total_amount=total_amount,
+                    item_count=len(order_items_data),
+                    total_qty=sum(quantity for _, quantity, _ in order_items_data),
                     order_status=random.choice(['PENDING', 'PREPARING', 'SERVED', 'SERVED', 'SERVED']),  # 60% served
                     order_type=random.choice(order_types),
                     payment_mode=random.choice(payment_modes)
@@ -627,6 +630,7 @@ class Command(BaseCommand):
         
         self.stdout.write(f'Created {CustomerOrder.objects.count()} customer orders')
         self.stdout.write(f'Created {OrderItem.objects.count()} order items')
+        call_command('rebuild_sales_rollups', stdout=self.stdout)
         
         # ==========================================
         # SUMMARY
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from mingos import forecasting
+from mingos.models import ForecastSnapshot
+from datetime import date, timedelta
+
+
+class Command(BaseCommand):
+    help = 'Precompute next-day sales forecasts into ForecastSnapshot (run nightly, after close)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Last day of history to use, YYYY-MM-DD; the forecast is for the day after (default: today)')
+        parser.add_argument('--keep-days', type=int, default=90,
+                            help='Delete snapshots of days more than this many days old (default: 90)')
+
+    def handle(self, *args, **options):
+        forecast_date, items = forecasting.save_snapshot(options['date'])
+        pruned, _ = ForecastSnapshot.objects.filter(
+            forecast_date__lt=forecast_date - timedelta(days=options['keep_days'])
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored forecasts of {items} menu items for {forecast_date}, pruned {pruned} old rows'
+        ))
@@ -1,3 +1,4 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 from mingos.models import CustomerOrder
 from django.utils import timezone
@@ -25,3 +26,4 @@ class Command(BaseCommand):
             order.save(update_fields=['order_datetime'])
         
         self.stdout.write(self.style.SUCCESS(f'Successfully updated {len(orders)} order dates'))
+        call_command('rebuild_sales_rollups', stdout=self.stdout)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from mingos import purchasing
+
+
+class Command(BaseCommand):
+    help = 'Replace the draft purchase orders with suggestions from stock, reorder levels and projected use'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cover-days', type=int,
+                            help='Days of projected use to order for (default: settings.MINGOS_PURCHASE_COVER_DAYS or 7)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Print the suggestions without writing draft purchase orders')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drafts, unsupplied = purchasing.suggest_purchases(days=options['cover_days'])
+            for draft in drafts:
+                self.stdout.write(f"{draft['supplier']}: {len(draft['lines'])} line(s), ₹{draft['total_amount']:.2f}")
+                for line in draft['lines']:
+                    self.stdout.write(f"  {line['name']}: {line['quantity']} {line['unit']} @ ₹{line['unit_price']}")
+        else:
+            pos, unsupplied = purchasing.create_draft_purchase_orders(days=options['cover_days'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {len(pos)} draft purchase order(s) with {sum(po.lines.count() for po in pos)} line(s)'
+            ))
+        for row in unsupplied:
+            self.stdout.write(self.style.WARNING(
+                f"No supplier linked for {row['name']} (short {row['quantity']} {row['unit']})"
+            ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0004_alter_orderitem_id_alter_purchaseorderline_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingDeduction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('customer_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_deductions', to='mingos.customerorder')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mingos.ingredient')),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0005_pendingdeduction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('folded_qty', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('last_entry_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField(auto_now_add=True)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='mingos.ingredient')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockLedgerEntry',
+            fields=[
+                ('entry_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entry_type', models.CharField(choices=[('ORDER', 'Order Deduction'), ('PURCHASE', 'Purchase Order Received'), ('ADJUSTMENT', 'Manual Adjustment')], max_length=20)),
+                ('quantity_change', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('notes', models.CharField(blank=True, max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('folded', models.BooleanField(default=False)),
+                ('ingredient', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='mingos.ingredient')),
+                ('reference_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='mingos.customerorder')),
+                ('reference_po', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='mingos.purchaseorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ingredient', 'folded'], name='mingos_ledger_tail_idx')],
+            },
+        ),
+    ]
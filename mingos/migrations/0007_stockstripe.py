@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0006_stockledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='is_hot',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='StockStripe',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_no', models.PositiveSmallIntegerField()),
+                ('quantity', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_stripes', to='mingos.ingredient')),
+            ],
+            options={
+                'unique_together': {('ingredient', 'stripe_no')},
+            },
+        ),
+    ]
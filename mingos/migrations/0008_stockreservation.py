@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0007_stockstripe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='reserved_stock_qty',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('customer_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='mingos.customerorder')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='mingos.ingredient')),
+            ],
+            options={
+                'unique_together': {('customer_order', 'ingredient')},
+            },
+        ),
+    ]
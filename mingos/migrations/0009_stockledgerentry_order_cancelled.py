@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0008_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockledgerentry',
+            name='entry_type',
+            field=models.CharField(choices=[('ORDER', 'Order Deduction'), ('ORDER_CANCELLED', 'Order Cancelled - Restored'), ('PURCHASE', 'Purchase Order Received'), ('ADJUSTMENT', 'Manual Adjustment')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0010_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerorder',
+            index=models.Index(fields=['order_datetime'], name='mingos_order_datetime_idx'),
+        ),
+    ]
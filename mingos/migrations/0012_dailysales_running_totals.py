@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:49
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_running_totals(apps, schema_editor):
+    DailySales = apps.get_model('mingos', 'DailySales')
+    DailyItemSales = apps.get_model('mingos', 'DailyItemSales')
+    quantities = dict(
+        DailyItemSales.objects.values('sales_date').annotate(q=Sum('quantity')).values_list('sales_date', 'q')
+    )
+    orders = amount = quantity = 0
+    rows = list(DailySales.objects.order_by('sales_date'))
+    for row in rows:
+        row.item_quantity = quantities.get(row.sales_date) or 0
+        orders += row.order_count
+        amount += row.total_amount
+        quantity += row.item_quantity
+        row.cum_order_count, row.cum_total_amount, row.cum_item_quantity = orders, amount, quantity
+    DailySales.objects.bulk_update(
+        rows, ['item_quantity', 'cum_order_count', 'cum_total_amount', 'cum_item_quantity'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0011_customerorder_datetime_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailysales',
+            name='cum_item_quantity',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysales',
+            name='cum_order_count',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailysales',
+            name='cum_total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=16),
+        ),
+        migrations.AddField(
+            model_name='dailysales',
+            name='item_quantity',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_running_totals, migrations.RunPython.noop),
+    ]
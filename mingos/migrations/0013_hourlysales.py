@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0012_dailysales_running_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sales_date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('item_quantity', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('sales_date', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0013_hourlysales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerorder',
+            name='item_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customerorder',
+            name='total_qty',
+            field=models.IntegerField(default=0),
+        ),
+    ]
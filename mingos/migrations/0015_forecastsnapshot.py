@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0014_customerorder_summary_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('forecast_date', models.DateField()),
+                ('predicted_qty', models.PositiveIntegerField(default=0)),
+                ('confidence', models.CharField(choices=[('low', 'Low'), ('high', 'High')], max_length=10)),
+                ('avg_daily_sales', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='mingos.menuitem')),
+            ],
+            options={
+                'unique_together': {('forecast_date', 'menu_item')},
+            },
+        ),
+    ]
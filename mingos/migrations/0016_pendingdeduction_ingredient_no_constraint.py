@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0015_forecastsnapshot'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pendingdeduction',
+            name='ingredient',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='mingos.ingredient'),
+        ),
+    ]
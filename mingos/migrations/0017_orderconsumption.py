@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0016_pendingdeduction_ingredient_no_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderConsumption',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('customer_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumption', to='mingos.customerorder')),
+                ('ingredient', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='mingos.ingredient')),
+            ],
+        ),
+    ]
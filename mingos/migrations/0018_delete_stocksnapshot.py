@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mingos', '0017_orderconsumption'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='StockSnapshot',
+        ),
+    ]
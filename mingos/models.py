@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 
 
@@ -15,15 +17,60 @@ class Supplier(models.Model):
         return self.name
 
 
+class IngredientQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate `on_hand_qty`: current_stock_qty plus the stock ledger
+        entries not yet folded into it by compaction, plus the striped
+        counters of hot ingredients not yet folded back; and
+        `available_qty`: on_hand_qty minus stock reserved by open orders.
+        """
+        tail = (
+            StockLedgerEntry.objects
+            .filter(ingredient=OuterRef('pk'), folded=False)
+            .order_by()
+            .values('ingredient')
+            .annotate(total=Sum('quantity_change'))
+            .values('total')
+        )
+        stripes = (
+            StockStripe.objects
+            .filter(ingredient=OuterRef('pk'))
+            .order_by()
+            .values('ingredient')
+            .annotate(total=Sum('quantity'))
+            .values('total')
+        )
+        decimal = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            on_hand_qty=models.ExpressionWrapper(
+                F('current_stock_qty')
+                + Coalesce(Subquery(tail, output_field=decimal), 0, output_field=decimal)
+                + Coalesce(Subquery(stripes, output_field=decimal), 0, output_field=decimal),
+                output_field=decimal,
+            ),
+            available_qty=models.ExpressionWrapper(
+                F('on_hand_qty') - F('reserved_stock_qty'),
+                output_field=decimal,
+            ),
+        )
+
+
 class Ingredient(models.Model):
     ingredient_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
     unit_of_measure = models.CharField(max_length=20)
     current_stock_qty = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     safety_stock_qty = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Held by PENDING/PREPARING orders; deducted when served, released when cancelled.
+    reserved_stock_qty = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     reorder_level = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     is_perishable = models.BooleanField(default=False)
     status = models.CharField(max_length=20, blank=True, null=True)
+    # Hot ingredients are deducted through StockStripe rows instead of this row.
+    is_hot = models.BooleanField(default=False)
+
+    objects = IngredientQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -125,6 +172,14 @@ class CustomerOrder(models.Model):
     order_status = models.CharField(max_length=20, choices=ORDER_STATUS, default='PENDING')
     payment_mode = models.CharField(max_length=50, blank=True, null=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Summary of the order lines, kept so listings need not join OrderItem
+    item_count = models.IntegerField(default=0)
+    total_qty = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order_datetime'], name='mingos_order_datetime_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.order_id} ({self.order_status})"
@@ -142,3 +197,159 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity} x {self.menu_item.name} (Order #{self.customer_order.order_id})"
+
+
+class PendingDeduction(models.Model):
+    """Ingredient quantity owed by an order whose inventory deduction is deferred."""
+    customer_order = models.ForeignKey(CustomerOrder, on_delete=models.CASCADE, related_name="pending_deductions")
+    # No FK constraint: InnoDB would take a shared lock on the ingredient
+    # row for every queued deduction, which deferring is meant to avoid.
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_constraint=False)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} {self.ingredient.name} for Order #{self.customer_order_id}"
+
+
+class OrderConsumption(models.Model):
+    """
+    Ingredient quantity an order's stock deduction took, as deducted, so a
+    cancellation gives back exactly that even if the recipe changed since.
+    Kept outside ledger mode, where the ORDER ledger entries already are
+    this record.
+    """
+    customer_order = models.ForeignKey(CustomerOrder, on_delete=models.CASCADE, related_name="consumption")
+    # No FK constraint, as for PendingDeduction: no lock on the ingredient row.
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, db_constraint=False)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} {self.ingredient.name} for Order #{self.customer_order_id}"
+
+
+class StockLedgerEntry(models.Model):
+    """Append-only record of one change to an ingredient's stock."""
+    ENTRY_TYPES = (
+        ('ORDER', 'Order Deduction'),
+        ('ORDER_CANCELLED', 'Order Cancelled - Restored'),
+        ('PURCHASE', 'Purchase Order Received'),
+        ('ADJUSTMENT', 'Manual Adjustment'),
+    )
+
+    entry_id = models.BigAutoField(primary_key=True)
+    # No FK constraint: InnoDB would take a shared lock on the ingredient
+    # row for every appended entry.
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="ledger_entries", db_constraint=False
+    )
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    quantity_change = models.DecimalField(max_digits=12, decimal_places=2)
+    reference_order = models.ForeignKey(CustomerOrder, on_delete=models.SET_NULL, null=True, blank=True)
+    reference_po = models.ForeignKey(PurchaseOrder, on_delete=models.SET_NULL, null=True, blank=True)
+    notes = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once compaction has folded the entry into current_stock_qty.
+    folded = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ingredient', 'folded'], name='mingos_ledger_tail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_type} {self.quantity_change:+} {self.ingredient.name}"
+
+
+class StockStripe(models.Model):
+    """One of several sub-counters absorbing deductions of a hot ingredient."""
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name="stock_stripes")
+    stripe_no = models.PositiveSmallIntegerField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('ingredient', 'stripe_no')
+
+    def __str__(self):
+        return f"{self.ingredient.name} stripe {self.stripe_no}: {self.quantity}"
+
+
+class StockReservation(models.Model):
+    """Ingredient quantity held by an open order until it is served or cancelled."""
+    customer_order = models.ForeignKey(CustomerOrder, on_delete=models.CASCADE, related_name="reservations")
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = ('customer_order', 'ingredient')
+
+    def __str__(self):
+        return f"{self.quantity} {self.ingredient.name} held by Order #{self.customer_order_id}"
+
+
+class DailySales(models.Model):
+    """
+    Orders, revenue and items sold per day, kept up to date by order
+    placement, with running totals up to and including the day (prefix
+    sums) so any date window is the difference of two rows.
+    """
+    sales_date = models.DateField(primary_key=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+    cum_order_count = models.PositiveBigIntegerField(default=0)
+    cum_total_amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    cum_item_quantity = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.sales_date}: {self.order_count} orders, {self.total_amount}"
+
+
+class DailyItemSales(models.Model):
+    """Quantity and revenue per menu item per day, kept up to date by order placement."""
+    sales_date = models.DateField()
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="daily_sales")
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('sales_date', 'menu_item')
+
+    def __str__(self):
+        return f"{self.sales_date} {self.menu_item.name}: {self.quantity}"
+
+
+class HourlySales(models.Model):
+    """Orders, revenue and items sold per hour of each day, kept up to date by order placement."""
+    sales_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    item_quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('sales_date', 'hour')
+
+    def __str__(self):
+        return f"{self.sales_date} {self.hour:02d}:00: {self.order_count} orders"
+
+
+class ForecastSnapshot(models.Model):
+    """Precomputed next-day sales prediction per menu item, written by the precompute_forecasts command."""
+    CONFIDENCE = (
+        ('low', 'Low'),
+        ('high', 'High'),
+    )
+
+    forecast_date = models.DateField()  # the day the prediction is for
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name="forecasts")
+    predicted_qty = models.PositiveIntegerField(default=0)
+    confidence = models.CharField(max_length=10, choices=CONFIDENCE)
+    avg_daily_sales = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('forecast_date', 'menu_item')
+
+    def __str__(self):
+        return f"{self.forecast_date} {self.menu_item.name}: {self.predicted_qty}"
@@ -0,0 +1,315 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, When, Value, DateTimeField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import analytics_cache, bom, cube, leaderboard, rollups
+from .inventory import (
+    deduct_for_orders, recipe_consumption, reserve_for_orders,
+    restore_order_stock, settle_reservations, stock_reservation_enabled,
+)
+from .models import CustomerOrder, MenuItem, OrderItem
+from .retry import atomic_with_retry
+
+MAX_BATCH_ORDERS = 500
+MAX_LINE_QUANTITY = 1000  # per menu item and order
+
+# Order status changes allowed, by target status
+STATUS_TRANSITIONS = {
+    'PREPARING': ('PENDING',),
+    'SERVED': ('PENDING', 'PREPARING'),
+    'CANCELLED': ('PENDING', 'PREPARING'),
+}
+
+
+def parse_order_lines(data):
+    """
+    Read the `item_<menu_item_id>` quantity fields posted by the order form.
+    Returns a dict: {menu_item_id: quantity}
+    """
+    lines = {}
+    for key, value in data.items():
+        if not key.startswith('item_') or not value.strip():
+            continue
+        try:
+            menu_item_id = int(key.split('_', 1)[1])
+            qty = int(value)
+        except ValueError:
+            continue
+        if qty > 0:
+            lines[menu_item_id] = lines.get(menu_item_id, 0) + qty
+    return lines
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def build_order_drafts(submitted):
+    """
+    Validate orders submitted as JSON by POS terminals against one menu
+    snapshot. Each submitted order looks like:
+        {"ref": "T1-0042", "order_datetime": "2026-02-01T12:30:00+05:30",
+         "order_type": "TAKEAWAY", "payment_mode": "UPI",
+         "items": [{"menu_item_id": 3, "quantity": 2}, ...]}
+    Quantities are whole numbers from 1 to MAX_LINE_QUANTITY per menu item.
+    Returns (drafts, errors, menu_items): one draft dict or None per order,
+    one list of error strings per order, and the {pk: MenuItem} snapshot.
+    """
+    wanted = set()
+    for entry in submitted:
+        items = entry.get('items') if isinstance(entry, dict) else None
+        for line in items if isinstance(items, list) else []:
+            if isinstance(line, dict) and _is_int(line.get('menu_item_id')):
+                wanted.add(line['menu_item_id'])
+    menu_items = MenuItem.objects.in_bulk(list(wanted))
+    order_types = dict(CustomerOrder.ORDER_TYPES)
+
+    drafts, errors = [], []
+    for entry in submitted:
+        problems = []
+        draft = {'lines': {}}
+        if not isinstance(entry, dict):
+            drafts.append(None)
+            errors.append(['Order must be a JSON object.'])
+            continue
+
+        items = entry.get('items') or []
+        if not isinstance(items, list):
+            problems.append(f'Invalid items: {items!r}')
+            items = []
+        for line in items:
+            menu_item_id = line.get('menu_item_id') if isinstance(line, dict) else None
+            qty = line.get('quantity') if isinstance(line, dict) else None
+            if not _is_int(menu_item_id) or not _is_int(qty) or qty <= 0:
+                problems.append(f'Invalid line: {line!r}')
+            elif draft['lines'].get(menu_item_id, 0) + qty > MAX_LINE_QUANTITY:
+                problems.append(f'Quantity of menu item {menu_item_id} is over {MAX_LINE_QUANTITY}.')
+            elif menu_item_id not in menu_items:
+                problems.append(f'Unknown menu item {menu_item_id}.')
+            elif not menu_items[menu_item_id].is_available:
+                problems.append(f'Menu item {menu_item_id} is not available.')
+            else:
+                draft['lines'][menu_item_id] = draft['lines'].get(menu_item_id, 0) + qty
+        if not draft['lines'] and not problems:
+            problems.append('Order has no items.')
+
+        if entry.get('order_datetime') is not None:
+            try:
+                order_datetime = parse_datetime(str(entry['order_datetime']))
+            except ValueError:
+                order_datetime = None
+            if order_datetime is None:
+                problems.append(f"Invalid order_datetime: {entry['order_datetime']!r}")
+            else:
+                if timezone.is_naive(order_datetime):
+                    order_datetime = timezone.make_aware(order_datetime)
+                draft['order_datetime'] = order_datetime
+
+        if entry.get('order_type') is not None:
+            if entry['order_type'] not in order_types:
+                problems.append(f"Invalid order_type: {entry['order_type']!r}")
+            else:
+                draft['order_type'] = entry['order_type']
+
+        if entry.get('payment_mode') is not None:
+            draft['payment_mode'] = str(entry['payment_mode'])[:50]
+
+        drafts.append(None if problems else draft)
+        errors.append(problems)
+
+    return drafts, errors, menu_items
+
+
+def _line_summaries():
+    """item_count and total_qty of each order, as subqueries on its OrderItem rows."""
+    lines = OrderItem.objects.filter(customer_order=OuterRef('pk')).order_by().values('customer_order')
+    return {
+        'item_count': Coalesce(Subquery(lines.annotate(n=Count('pk')).values('n')), 0),
+        'total_qty': Coalesce(Subquery(lines.annotate(qty=Sum('quantity')).values('qty')), 0),
+    }
+
+
+def refresh_order_summaries(orders):
+    """
+    Recompute item_count and total_qty of the `orders` queryset from their
+    lines, in one UPDATE. Returns the number of orders updated.
+    """
+    return orders.update(**_line_summaries())
+
+
+def order_summary_mismatches(orders):
+    """Orders of the `orders` queryset whose item_count or total_qty disagree with their lines."""
+    summaries = _line_summaries()
+    return (
+        orders
+        .annotate(actual_item_count=summaries['item_count'], actual_total_qty=summaries['total_qty'])
+        .exclude(item_count=F('actual_item_count'), total_qty=F('actual_total_qty'))
+    )
+
+
+def _insert_orders(orders):
+    if connection.features.can_return_rows_from_bulk_insert:
+        CustomerOrder.objects.bulk_create(orders)
+    else:
+        # MySQL does not report the ids of a multi-row INSERT, which the
+        # order lines need, so insert the order headers one by one.
+        for order in orders:
+            order.save(force_insert=True)
+
+
+@atomic_with_retry
+def place_orders(drafts, menu_items=None):
+    """
+    Create many orders at once. Each draft is a dict with a `lines` mapping
+    {menu_item_id: quantity} plus optional CustomerOrder field values
+    (order_datetime, order_type, payment_mode, order_status).
+
+    All order lines go in with one bulk INSERT, and the recipe ingredients
+    of the whole batch are summed and deducted with one combined UPDATE
+    (or queued, appended to the ledger, or reserved, depending on mode).
+    The daily sales rollups are updated in the same transaction.
+    `menu_items` is an optional {pk: MenuItem} snapshot the drafts were
+    validated against; every line must reference an item in it.
+    The transaction is retried automatically on deadlock.
+    Returns the created orders, in draft order.
+    """
+    if menu_items is None:
+        menu_items = MenuItem.objects.in_bulk(
+            list({pk for draft in drafts for pk in draft['lines']})
+        )
+
+    orders, order_items, backdated = [], [], []
+    batch_lines = defaultdict(int)
+    for draft in drafts:
+        fields = {key: value for key, value in draft.items() if key != 'lines'}
+        order_datetime = fields.pop('order_datetime', None)
+        fields.setdefault('order_status', 'PENDING')
+
+        items = [
+            OrderItem(
+                menu_item=menu_items[pk],
+                quantity=qty,
+                unit_price=menu_items[pk].price,
+                line_amount=menu_items[pk].price * qty,
+            )
+            for pk, qty in draft['lines'].items()
+        ]
+        order = CustomerOrder(
+            total_amount=sum(item.line_amount for item in items),
+            item_count=len(items),
+            total_qty=sum(item.quantity for item in items),
+            **fields
+        )
+        orders.append(order)
+        order_items.append(items)
+        backdated.append(order_datetime)
+        for pk, qty in draft['lines'].items():
+            batch_lines[pk] += qty
+
+    _insert_orders(orders)
+    for order, items in zip(orders, order_items):
+        for item in items:
+            item.customer_order = order
+    OrderItem.objects.bulk_create([item for items in order_items for item in items])
+
+    # order_datetime is auto_now_add, so original terminal timestamps are
+    # written back with one UPDATE after the insert.
+    backdated = {order.pk: dt for order, dt in zip(orders, backdated) if dt is not None}
+    if backdated:
+        CustomerOrder.objects.filter(pk__in=list(backdated)).update(
+            order_datetime=Case(
+                *[When(pk=pk, then=Value(dt)) for pk, dt in backdated.items()],
+                output_field=DateTimeField(),
+            )
+        )
+        for order in orders:
+            order.order_datetime = backdated.get(order.pk, order.order_datetime)
+
+    # Reduce (or reserve) inventory based on recipe
+    boms = bom.get_boms(batch_lines)
+    consumption_by_order = [
+        (order.pk, recipe_consumption(draft['lines'], boms))
+        for order, draft in zip(orders, drafts)
+    ]
+    if stock_reservation_enabled():
+        reserve_for_orders(consumption_by_order)
+    else:
+        deduct_for_orders(consumption_by_order)
+
+    # Sales rollups last: today's row is touched by every order, so the
+    # ingredient rows locked above (direct and reservation modes) stay
+    # locked through these statements too, until the order commits.
+    rollups.record_orders(orders, order_items)
+    analytics_cache.data_changed()
+    cube.orders_placed(orders, order_items)
+    leaderboard.orders_placed(orders, order_items)
+    return orders
+
+
+def place_order(lines, **order_fields):
+    """
+    Create a CustomerOrder with its OrderItem rows and deduct the recipe
+    ingredients from inventory, using a fixed number of queries:
+    one menu fetch, one order insert, one bulk line insert and one
+    combined stock UPDATE (plus one Recipe query on a BOM cache miss).
+
+    Unknown menu item ids are skipped. Returns the order, or None when
+    no valid line remains.
+    """
+    menu_items = MenuItem.objects.in_bulk(list(lines))
+    lines = {pk: qty for pk, qty in lines.items() if pk in menu_items}
+    if not lines:
+        return None
+    return place_orders([{'lines': lines, **order_fields}], menu_items)[0]
+
+
+@atomic_with_retry
+def change_order_status(order_ids, new_status):
+    """
+    Move many orders to `new_status` at once. Orders whose current status
+    does not allow the move are left untouched, so repeating a change is a
+    no-op. Stock is settled for all moved orders together: reservations are
+    deducted when orders are served and released when they are cancelled;
+    cancelled orders whose stock was already deducted get it restored, and
+    cancelled orders are taken out of the sales rollups, the sales cube and
+    the live leaderboard.
+    Returns the ids of the orders that changed status.
+    """
+    allowed_from = STATUS_TRANSITIONS.get(new_status)
+    if allowed_from is None:
+        raise ValueError(f"Orders cannot be moved to {new_status!r}.")
+
+    moved = list(
+        CustomerOrder.objects
+        .select_for_update()
+        .filter(pk__in=order_ids, order_status__in=allowed_from)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+    if not moved:
+        return []
+
+    if new_status == 'SERVED':
+        settle_reservations(moved, served=True)
+    elif new_status == 'CANCELLED':
+        released = set(settle_reservations(moved, served=False))
+        restore_order_stock([pk for pk in moved if pk not in released])
+        rollups.remove_orders(moved)
+        cube.orders_cancelled(moved)
+        leaderboard.orders_cancelled(moved)
+    CustomerOrder.objects.filter(pk__in=moved).update(order_status=new_status)
+    analytics_cache.data_changed()
+    return moved
+
+
+def cancel_orders(order_ids):
+    """
+    Cancel many orders in one transaction and give their ingredients back.
+    Already cancelled or served orders are skipped, so this is idempotent.
+    Returns the ids of the orders cancelled by this call.
+    """
+    return change_order_status(order_ids, 'CANCELLED')
@@ -0,0 +1,66 @@
+"""
+Ingredient demand projected from the next-day sales forecast.
+
+Recipes are held as a sparse menu item x ingredient matrix of
+quantity_required; multiplying the vector of predicted portions per menu
+item through it gives the projected consumption of every ingredient in
+one product, however large the menu and the ingredient list.
+"""
+import numpy as np
+from scipy import sparse
+
+from . import forecasting
+from .models import Ingredient, Recipe
+
+
+def recipe_matrix():
+    """
+    Recipes as (menu_item_ids, ingredient_ids, matrix), where matrix[i, j]
+    is the quantity of ingredient_ids[j] one portion of menu_item_ids[i] uses.
+    """
+    rows = list(Recipe.objects.values_list('menu_item_id', 'ingredient_id', 'quantity_required'))
+    menu_item_ids = sorted({row[0] for row in rows})
+    ingredient_ids = sorted({row[1] for row in rows})
+    item_index = {pk: i for i, pk in enumerate(menu_item_ids)}
+    ingredient_index = {pk: j for j, pk in enumerate(ingredient_ids)}
+    matrix = sparse.csr_matrix(
+        (
+            [float(qty) for _, _, qty in rows],
+            ([item_index[row[0]] for row in rows], [ingredient_index[row[1]] for row in rows]),
+        ),
+        shape=(len(menu_item_ids), len(ingredient_ids)),
+    )
+    return menu_item_ids, ingredient_ids, matrix
+
+
+def project_consumption(portions):
+    """Ingredient use of `portions` ({menu_item_id: quantity}), as {ingredient_id: quantity}."""
+    menu_item_ids, ingredient_ids, matrix = recipe_matrix()
+    vector = np.array([portions.get(pk, 0) for pk in menu_item_ids], dtype=float)
+    return dict(zip(ingredient_ids, matrix.T @ vector))
+
+
+def ingredient_demand(today=None):
+    """
+    Tomorrow's projected use of every ingredient, from the next-day forecast,
+    with days of cover: available stock divided by that daily use (None
+    when no use is projected). Returns one dict per ingredient, shortest
+    cover first.
+    """
+    predictions = forecasting.next_day_predictions(today)
+    use = project_consumption({pk: p['predicted_qty'] for pk, p in predictions.items()})
+
+    rows = []
+    for ingredient in Ingredient.objects.with_stock().order_by('name'):
+        projected = float(use.get(ingredient.pk, 0.0))
+        stock = float(ingredient.available_qty)
+        rows.append({
+            'ingredient_id': ingredient.pk,
+            'name': ingredient.name,
+            'unit': ingredient.unit_of_measure,
+            'available_qty': stock,
+            'projected_qty': round(projected, 2),
+            'days_of_cover': round(max(stock, 0.0) / projected, 1) if projected > 0 else None,
+        })
+    rows.sort(key=lambda row: (row['days_of_cover'] is None, row['days_of_cover'] or 0))
+    return rows
@@ -0,0 +1,181 @@
+"""
+Purchase-order suggestions.
+
+Every ingredient is checked at once, as NumPy arrays over the whole
+ingredient list. The stock position (available stock plus quantities still
+due on open purchase orders) is compared with the reorder level and with
+safety stock plus the consumption projected over the cover period
+(settings.MINGOS_PURCHASE_COVER_DAYS, default 7). Ingredients short on
+either count are ordered up to the higher of reorder level and safety
+stock, plus that projected consumption.
+
+Each shortfall goes to the linked supplier (SupplierIngredient) whose last
+PurchaseOrderLine.unit_price for it is lowest, at that price, and the
+lines are grouped into one draft purchase order per supplier for the
+kitchen to review and confirm in bulk.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, Max, Subquery, Sum
+from django.utils import timezone
+
+from . import forecasting, projection
+from .models import Ingredient, PurchaseOrder, PurchaseOrderLine, Supplier, SupplierIngredient
+from .retry import atomic_with_retry
+
+DRAFT = 'Draft'
+CONFIRMED = 'Ordered'
+CLOSED_STATUSES = ('Delivered', DRAFT)  # anything else may still deliver
+
+
+def cover_days():
+    return getattr(settings, 'MINGOS_PURCHASE_COVER_DAYS', 7)
+
+
+def _on_order(ingredient_ids):
+    """Quantities still due on open purchase orders, as {ingredient_id: qty}."""
+    rows = (
+        PurchaseOrderLine.objects
+        .filter(ingredient_id__in=ingredient_ids, received_qty__lt=F('ordered_qty'))
+        .exclude(purchase_order__status__in=CLOSED_STATUSES)
+        .values('ingredient_id')
+        .annotate(qty=Sum(F('ordered_qty') - F('received_qty')))
+    )
+    return {row['ingredient_id']: float(row['qty']) for row in rows}
+
+
+def _last_prices(ingredient_ids):
+    """Unit price of the latest non-draft purchase line per (supplier_id, ingredient_id)."""
+    latest = (
+        PurchaseOrderLine.objects
+        .filter(ingredient_id__in=ingredient_ids)
+        .exclude(purchase_order__status=DRAFT)
+        .values('purchase_order__supplier_id', 'ingredient_id')
+        .annotate(last_id=Max('pk'))
+        .values('last_id')
+    )
+    rows = (
+        PurchaseOrderLine.objects
+        .filter(pk__in=Subquery(latest))
+        .values_list('purchase_order__supplier_id', 'ingredient_id', 'unit_price')
+    )
+    return {(supplier_id, ingredient_id): price for supplier_id, ingredient_id, price in rows}
+
+
+def suggest_purchases(today=None, days=None):
+    """
+    Work out what to order. Returns (drafts, unsupplied): drafts is a list
+    of {'supplier_id', 'supplier', 'lines', 'total_amount'} with lines of
+    {'ingredient_id', 'name', 'unit', 'quantity', 'unit_price', 'line_amount'};
+    unsupplied lists the short ingredients no supplier is linked to.
+    """
+    days = cover_days() if days is None else days
+    rows = list(
+        Ingredient.objects.with_stock()
+        .order_by('pk')
+        .values_list('pk', 'name', 'unit_of_measure', 'available_qty', 'reorder_level', 'safety_stock_qty')
+    )
+    if not rows:
+        return [], []
+    ids = np.array([row[0] for row in rows])
+    available, reorder, safety = (np.array([float(row[k]) for row in rows]) for k in (3, 4, 5))
+
+    predictions = forecasting.next_day_predictions(today)
+    use_by_id = projection.project_consumption({pk: p['predicted_qty'] for pk, p in predictions.items()})
+    on_order_by_id = _on_order(ids.tolist())
+    demand = np.array([use_by_id.get(pk, 0.0) for pk in ids.tolist()]) * days
+    on_order = np.array([on_order_by_id.get(pk, 0.0) for pk in ids.tolist()])
+
+    position = available + on_order
+    quantity = np.ceil(np.maximum(reorder, safety) + demand - position)
+    short = ((position < reorder) | (position < safety + demand)) & (quantity > 0)
+    short_ids = ids[short]
+    if not len(short_ids):
+        return [], []
+
+    # Cheapest last price first, suppliers never bought from after them,
+    # then the lowest supplier id; the first link per ingredient wins.
+    links = np.array(
+        SupplierIngredient.objects
+        .filter(ingredient_id__in=short_ids.tolist())
+        .exclude(supplier__status='Inactive')
+        .values_list('ingredient_id', 'supplier_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    prices = _last_prices(short_ids.tolist())
+    link_price = np.array(
+        [float(prices.get((supplier_id, ingredient_id), np.inf)) for ingredient_id, supplier_id in links.tolist()]
+    )
+    order = np.lexsort((links[:, 1], link_price, links[:, 0]))
+    _, first = np.unique(links[order, 0], return_index=True)
+    chosen = dict(links[order[first]].tolist())
+
+    names = {row[0]: row for row in rows}
+    drafts, unsupplied = {}, []
+    for ingredient_id, qty in zip(short_ids.tolist(), quantity[short].tolist()):
+        _, name, unit = names[ingredient_id][:3]
+        supplier_id = chosen.get(ingredient_id)
+        if supplier_id is None:
+            unsupplied.append({'ingredient_id': ingredient_id, 'name': name, 'unit': unit, 'quantity': Decimal(int(qty))})
+            continue
+        unit_price = prices.get((supplier_id, ingredient_id), Decimal('0.00'))
+        line = {
+            'ingredient_id': ingredient_id,
+            'name': name,
+            'unit': unit,
+            'quantity': Decimal(int(qty)),
+            'unit_price': unit_price,
+            'line_amount': unit_price * int(qty),
+        }
+        drafts.setdefault(supplier_id, []).append(line)
+
+    supplier_names = dict(Supplier.objects.filter(pk__in=list(drafts)).values_list('pk', 'name'))
+    return [
+        {
+            'supplier_id': supplier_id,
+            'supplier': supplier_names.get(supplier_id),
+            'lines': lines,
+            'total_amount': sum(line['line_amount'] for line in lines),
+        }
+        for supplier_id, lines in sorted(drafts.items())
+    ], unsupplied
+
+
+@atomic_with_retry
+def create_draft_purchase_orders(today=None, days=None):
+    """
+    Replace all draft purchase orders with freshly suggested ones, one per
+    supplier. Returns (created purchase orders, unsupplied ingredients).
+    """
+    today = today or timezone.localdate()
+    drafts, unsupplied = suggest_purchases(today, days)
+    PurchaseOrder.objects.filter(status=DRAFT).delete()
+
+    pos, lines = [], []
+    for draft in drafts:
+        po = PurchaseOrder.objects.create(
+            supplier_id=draft['supplier_id'], order_date=today, status=DRAFT, total_amount=draft['total_amount'],
+        )
+        pos.append(po)
+        lines.extend(
+            PurchaseOrderLine(
+                purchase_order=po,
+                line_no=line_no,
+                ingredient_id=line['ingredient_id'],
+                ordered_qty=line['quantity'],
+                unit_price=line['unit_price'],
+                line_amount=line['line_amount'],
+            )
+            for line_no, line in enumerate(draft['lines'], 1)
+        )
+    PurchaseOrderLine.objects.bulk_create(lines)
+    return pos, unsupplied
+
+
+def confirm_purchase_orders(po_ids):
+    """Place the given draft purchase orders with their suppliers, dated today. Returns how many were confirmed."""
+    return PurchaseOrder.objects.filter(pk__in=po_ids, status=DRAFT).update(
+        status=CONFIRMED, order_date=timezone.localdate()
+    )
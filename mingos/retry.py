@@ -0,0 +1,82 @@
+"""
+Automatic retry of whole transactions that lose a lock conflict.
+
+MySQL (InnoDB) aborts one side of a deadlock with error 1213 and gives up
+waiting for a row lock with 1205; PostgreSQL reports deadlocks and
+serialization failures, SQLite reports "database is locked". In all of
+these cases the transaction was rolled back and running it again is safe.
+"""
+import functools
+import random
+import threading
+import time
+
+from django.db import OperationalError, connection, transaction
+
+MYSQL_DEADLOCK = 1213
+MYSQL_LOCK_WAIT_TIMEOUT = 1205
+
+_lock = threading.Lock()
+_stats = {'transactions': 0, 'retries': 0, 'deadlocks': 0, 'lock_timeouts': 0, 'gave_up': 0}
+
+
+def contention_kind(exc):
+    """Return 'deadlocks' or 'lock_timeouts' for a retryable error, else None."""
+    code = exc.args[0] if exc.args and isinstance(exc.args[0], int) else None
+    message = str(exc).lower()
+    if code == MYSQL_DEADLOCK or 'deadlock' in message or 'serializ' in message:
+        return 'deadlocks'
+    if code == MYSQL_LOCK_WAIT_TIMEOUT or 'lock wait timeout' in message or 'database is locked' in message:
+        return 'lock_timeouts'
+    return None
+
+
+def _count(key, n=1):
+    with _lock:
+        _stats[key] += n
+
+
+def atomic_with_retry(func=None, *, attempts=4, base_delay=0.05, max_delay=1.0):
+    """
+    Like transaction.atomic, but re-run the whole function when the
+    transaction is aborted by a deadlock or lock timeout, up to `attempts`
+    times with jittered exponential backoff capped at `max_delay` seconds.
+
+    When called inside an outer transaction it behaves like plain
+    transaction.atomic: only the outermost transaction can be retried.
+    """
+    if func is None:
+        return functools.partial(
+            atomic_with_retry, attempts=attempts, base_delay=base_delay, max_delay=max_delay
+        )
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+
+        _count('transactions')
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+            except OperationalError as exc:
+                kind = contention_kind(exc)
+                if kind is None:
+                    raise
+                _count(kind)
+                if attempt == attempts - 1:
+                    _count('gave_up')
+                    raise
+                _count('retries')
+                delay = min(max_delay, base_delay * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+    return wrapper
+
+
+def stats():
+    """Retry counters of this process."""
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,277 @@
+"""
+Daily sales rollups.
+
+DailySales, HourlySales and DailyItemSales hold one row per day (per hour
+of each day, per menu item and day), so analytics read a handful of rows per day shown instead of every
+order ever taken. DailySales also carries running totals (prefix sums) so
+the totals of any date window are the difference of two rows. Order
+placement adds to them inside its own transaction and cancellation takes
+them back out; rebuild() recomputes a range of days from the raw orders
+and refresh_running_totals() redoes the prefix sums.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Case, When, Value, F, Q, Sum, Count
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from . import analytics_cache
+from .models import CustomerOrder, DailyItemSales, DailySales, HourlySales, OrderItem
+from .retry import atomic_with_retry
+
+
+def sales_date(dt):
+    """The local calendar day an order timestamp belongs to."""
+    return timezone.localdate(dt) if timezone.is_aware(dt) else dt.date()
+
+
+def sales_hour(dt):
+    """The local hour of the day an order timestamp belongs to."""
+    return timezone.localtime(dt).hour if timezone.is_aware(dt) else dt.hour
+
+
+def day_bounds(start, end):
+    """Half-open [start 00:00, day after end 00:00) datetime range covering start..end."""
+    lo = datetime.combine(start, time.min)
+    hi = datetime.combine(end + timedelta(days=1), time.min)
+    if not settings.USE_TZ:
+        return lo, hi
+    return timezone.make_aware(lo), timezone.make_aware(hi)
+
+
+def _add_to(model, key_fields, totals):
+    """
+    Add `totals` {key tuple: {field: amount}} onto rollup rows, creating
+    the missing rows first: one INSERT and one UPDATE however many rows
+    are touched. Keys are visited in sorted order so concurrent writers
+    lock rows in the same order.
+    """
+    keys = sorted(totals)
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in keys],
+        ignore_conflicts=True,
+    )
+    matches = [Q(**dict(zip(key_fields, key))) for key in keys]
+    updates = {}
+    for field in totals[keys[0]]:
+        updates[field] = F(field) + Case(
+            *[When(match, then=Value(totals[key][field])) for match, key in zip(matches, keys)],
+            default=Value(0),
+            output_field=model._meta.get_field(field),
+        )
+    model.objects.filter(reduce(or_, matches)).update(**updates)
+
+
+DAY_FIELDS = ('order_count', 'total_amount', 'item_quantity')
+RUNNING_FIELDS = {field: f'cum_{field}' for field in DAY_FIELDS}
+
+
+def _add_to_days(totals):
+    """
+    Add `totals` {day: {field: amount}} onto DailySales and onto the
+    running totals of that day and every later day, with one UPDATE.
+    A missing day row is created first, starting from the running totals
+    of the day before it (locked, so a concurrent backdated order cannot
+    slip in between).
+    """
+    days = sorted(totals)
+    existing = set(
+        DailySales.objects.select_for_update().filter(sales_date__in=days).values_list('sales_date', flat=True)
+    )
+    for day in days:
+        if day in existing:
+            continue
+        previous = (
+            DailySales.objects.select_for_update()
+            .filter(sales_date__lt=day)
+            .order_by('-sales_date')
+            .values(*RUNNING_FIELDS.values())
+            .first()
+        )
+        DailySales.objects.bulk_create([DailySales(sales_date=day, **(previous or {}))], ignore_conflicts=True)
+
+    updates = {}
+    running = {field: 0 for field in DAY_FIELDS}
+    steps = []  # (day, running totals up to and including day)
+    for day in days:
+        for field in DAY_FIELDS:
+            running[field] += totals[day][field]
+        steps.append((day, dict(running)))
+    for field, cum_field in RUNNING_FIELDS.items():
+        updates[field] = F(field) + Case(
+            *[When(sales_date=day, then=Value(totals[day][field])) for day in days],
+            default=Value(0),
+            output_field=DailySales._meta.get_field(field),
+        )
+        # Latest step first: a row takes the increments of every day up to it.
+        updates[cum_field] = F(cum_field) + Case(
+            *[When(sales_date__gte=day, then=Value(step[field])) for day, step in reversed(steps)],
+            default=Value(0),
+            output_field=DailySales._meta.get_field(cum_field),
+        )
+    DailySales.objects.filter(sales_date__gte=days[0]).update(**updates)
+
+
+def _apply_orders(orders, order_items, sign):
+    """Add (sign 1) or subtract (sign -1) orders and their lines on every rollup."""
+    days = defaultdict(lambda: {'order_count': 0, 'total_amount': Decimal('0'), 'item_quantity': 0})
+    hours = defaultdict(lambda: {'order_count': 0, 'total_amount': Decimal('0'), 'item_quantity': 0})
+    items = defaultdict(lambda: {'quantity': 0, 'revenue': Decimal('0')})
+    for order, lines in zip(orders, order_items):
+        day = sales_date(order.order_datetime)
+        hour = (day, sales_hour(order.order_datetime))
+        days[day]['order_count'] += sign
+        days[day]['total_amount'] += sign * order.total_amount
+        hours[hour]['order_count'] += sign
+        hours[hour]['total_amount'] += sign * order.total_amount
+        for item in lines:
+            days[day]['item_quantity'] += sign * item.quantity
+            hours[hour]['item_quantity'] += sign * item.quantity
+            items[(day, item.menu_item_id)]['quantity'] += sign * item.quantity
+            items[(day, item.menu_item_id)]['revenue'] += sign * item.line_amount
+
+    if days:
+        _add_to_days(days)
+    if hours:
+        _add_to(HourlySales, ('sales_date', 'hour'), hours)
+    if items:
+        _add_to(DailyItemSales, ('sales_date', 'menu_item_id'), items)
+
+
+def record_orders(orders, order_items):
+    """
+    Add newly placed orders to the rollups. `order_items` holds the list
+    of OrderItem rows of each order. Runs inside the placing transaction,
+    so the rollups never disagree with the committed orders.
+    """
+    _apply_orders(orders, order_items, 1)
+
+
+def remove_orders(order_ids):
+    """
+    Take cancelled orders back out of the rollups. Runs inside the
+    cancelling transaction, before the orders change status.
+    """
+    orders = list(CustomerOrder.objects.filter(pk__in=order_ids).order_by('pk'))
+    lines = defaultdict(list)
+    for item in OrderItem.objects.filter(customer_order_id__in=order_ids):
+        lines[item.customer_order_id].append(item)
+    _apply_orders(orders, [lines[order.pk] for order in orders], -1)
+
+
+@atomic_with_retry
+def rebuild(start, end):
+    """
+    Recompute the rollups of days start..end (inclusive) from the raw
+    orders. The existing DailySales rows of the range are locked first, so
+    orders placed meanwhile for those days wait instead of being lost.
+    Running totals are left to refresh_running_totals(), since they depend
+    on every earlier day. Cancelled orders are left out. Returns (day rows,
+    hour rows, item rows) written.
+    """
+    list(DailySales.objects.select_for_update().filter(sales_date__range=(start, end)).values_list('pk'))
+    lo, hi = day_bounds(start, end)
+    orders = CustomerOrder.objects.exclude(order_status='CANCELLED')
+    order_items = OrderItem.objects.exclude(customer_order__order_status='CANCELLED')
+
+    days = (
+        orders
+        .filter(order_datetime__gte=lo, order_datetime__lt=hi)
+        .annotate(day=TruncDate('order_datetime'))
+        .values('day')
+        .annotate(order_count=Count('pk'), total_amount=Sum('total_amount'))
+    )
+    hours = (
+        order_items
+        .filter(customer_order__order_datetime__gte=lo, customer_order__order_datetime__lt=hi)
+        .annotate(
+            day=TruncDate('customer_order__order_datetime'),
+            hour=ExtractHour('customer_order__order_datetime'),
+        )
+        .values('day', 'hour')
+        .annotate(quantity=Sum('quantity'))
+    )
+    hour_orders = (
+        orders
+        .filter(order_datetime__gte=lo, order_datetime__lt=hi)
+        .annotate(day=TruncDate('order_datetime'), hour=ExtractHour('order_datetime'))
+        .values('day', 'hour')
+        .annotate(order_count=Count('pk'), total_amount=Sum('total_amount'))
+    )
+    items = (
+        order_items
+        .filter(customer_order__order_datetime__gte=lo, customer_order__order_datetime__lt=hi)
+        .annotate(day=TruncDate('customer_order__order_datetime'))
+        .values('day', 'menu_item_id')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('line_amount'))
+    )
+    quantities = defaultdict(int)
+    for row in items:
+        quantities[row['day']] += row['quantity'] or 0
+    day_rows = [
+        DailySales(
+            sales_date=row['day'], order_count=row['order_count'],
+            total_amount=row['total_amount'] or 0, item_quantity=quantities[row['day']],
+        )
+        for row in days
+    ]
+    hour_quantities = {(row['day'], row['hour']): row['quantity'] or 0 for row in hours}
+    hour_rows = [
+        HourlySales(
+            sales_date=row['day'], hour=row['hour'], order_count=row['order_count'],
+            total_amount=row['total_amount'] or 0,
+            item_quantity=hour_quantities.get((row['day'], row['hour']), 0),
+        )
+        for row in hour_orders
+    ]
+    item_rows = [
+        DailyItemSales(
+            sales_date=row['day'], menu_item_id=row['menu_item_id'],
+            quantity=row['quantity'] or 0, revenue=row['revenue'] or 0,
+        )
+        for row in items
+    ]
+
+    DailyItemSales.objects.filter(sales_date__range=(start, end)).delete()
+    HourlySales.objects.filter(sales_date__range=(start, end)).delete()
+    DailySales.objects.filter(sales_date__range=(start, end)).delete()
+    DailySales.objects.bulk_create(day_rows)
+    HourlySales.objects.bulk_create(hour_rows, batch_size=1000)
+    DailyItemSales.objects.bulk_create(item_rows, batch_size=1000)
+    analytics_cache.data_changed()
+    return len(day_rows), len(hour_rows), len(item_rows)
+
+
+@atomic_with_retry
+def refresh_running_totals(start=None):
+    """
+    Recompute the running totals of DailySales from `start` (default: the
+    first day) onwards, carrying on from the row before it. Returns the
+    number of rows rewritten.
+    """
+    rows = DailySales.objects.select_for_update().order_by('sales_date')
+    running = {field: 0 for field in DAY_FIELDS}
+    if start is not None:
+        previous = (
+            DailySales.objects.filter(sales_date__lt=start)
+            .order_by('-sales_date')
+            .values(*RUNNING_FIELDS.values())
+            .first()
+        )
+        if previous:
+            running = {field: previous[cum_field] for field, cum_field in RUNNING_FIELDS.items()}
+        rows = rows.filter(sales_date__gte=start)
+
+    rows = list(rows)
+    for row in rows:
+        for field, cum_field in RUNNING_FIELDS.items():
+            running[field] += getattr(row, field)
+            setattr(row, cum_field, running[field])
+    DailySales.objects.bulk_update(rows, list(RUNNING_FIELDS.values()), batch_size=1000)
+    analytics_cache.data_changed()
+    return len(rows)
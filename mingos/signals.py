@@ -0,0 +1,43 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import analytics_cache, bom
+from .models import Ingredient, MenuCategory, MenuItem, Recipe
+
+
+def _invalidate_bom(menu_item_id):
+    # Invalidate now for this transaction, and again once the change is
+    # visible to other connections so nobody caches the pre-commit recipe.
+    bom.invalidate(menu_item_id)
+    transaction.on_commit(lambda: bom.invalidate(menu_item_id))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_moving(sender, instance, **kwargs):
+    """A recipe row re-pointed to another menu item also changes the old item's BOM."""
+    if instance.pk is None:
+        return
+    old_menu_item_id = (
+        Recipe.objects.filter(pk=instance.pk).values_list('menu_item_id', flat=True).first()
+    )
+    if old_menu_item_id is not None and old_menu_item_id != instance.menu_item_id:
+        _invalidate_bom(old_menu_item_id)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    _invalidate_bom(instance.menu_item_id)
+    analytics_cache.data_changed()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=MenuCategory)
+@receiver(post_delete, sender=MenuCategory)
+def catalogue_changed(sender, instance, **kwargs):
+    # Names, categories and reorder levels all show up on the analytics pages.
+    analytics_cache.data_changed()
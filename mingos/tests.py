@@ -1,3 +1,567 @@
-from django.test import TestCase
+import json
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import analytics, analytics_cache, cube, forecasting, inventory, leaderboard, rollups
+from .models import (
+    CustomerOrder, DailyItemSales, DailySales, ForecastSnapshot, HourlySales, Ingredient, MenuCategory,
+    MenuItem, OrderItem, PendingDeduction, PurchaseOrder, PurchaseOrderLine, Recipe, StockLedgerEntry,
+    StockReservation, StockStripe, Supplier, SupplierIngredient,
+)
+from .orders import MAX_LINE_QUANTITY, build_order_drafts, cancel_orders, change_order_status, place_order
+from .purchasing import suggest_purchases
+from .rollups import day_bounds
+
+
+class DashboardQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        drinks = MenuCategory.objects.create(name='Drinks')
+        bun = Ingredient.objects.create(
+            name='Bun', unit_of_measure='pcs', current_stock_qty=Decimal('100'), reorder_level=Decimal('10')
+        )
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+        cls.cola = MenuItem.objects.create(name='Cola', price=Decimal('40.00'), category=drinks)
+        MenuItem.objects.create(name='Soup', price=Decimal('80.00'), category=mains)
+        Recipe.objects.create(menu_item=cls.burger, ingredient=bun, quantity_required=Decimal('1'))
+
+        place_order({cls.burger.pk: 2, cls.cola.pk: 1})
+        place_order({cls.cola.pk: 3})
+        forecasting.save_snapshot()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dashboard_query_count(self):
+        # Sales totals and 7-day series, the per-item GROUP BY, the
+        # low-stock count and the forecast snapshot.
+        with self.assertNumQueries(4):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_forecast_fallback(self):
+        snapshot = self.client.get('/').context['predicted_items']
+        ForecastSnapshot.objects.all().delete()
+        cache.clear()
+        # No snapshot: one extra query for the live forecast input.
+        with self.assertNumQueries(5):
+            response = self.client.get('/')
+        self.assertEqual(response.context['predicted_items'], snapshot)
+        self.assertCountEqual([item['name'] for item in snapshot], ['Burger', 'Cola'])
+
+    def test_dashboard_reads_last_nights_snapshot(self):
+        # A nightly run after yesterday's close stored today's forecast,
+        # and none has been stored for tomorrow yet.
+        ForecastSnapshot.objects.update(forecast_date=timezone.localdate())
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get('/')
+        self.assertEqual(len(response.context['predicted_items']), 2)
+
+    def test_dashboard_leaves_out_items_whose_orders_were_all_cancelled(self):
+        soup = MenuItem.objects.get(name='Soup')
+        cancel_orders([place_order({soup.pk: 2}).pk])
+        cache.clear()
+        context = self.client.get('/').context
+        self.assertEqual(context['top_items_labels_json'], '["Burger", "Cola"]')
+        self.assertEqual(context['total_revenue'], 400.0)
+
+    def test_dashboard_figures(self):
+        context = self.client.get('/').context
+        self.assertEqual(context['total_orders'], 2)
+        self.assertEqual(context['total_revenue'], 400.0)
+        self.assertEqual(context['total_menu_items'], 3)
+        self.assertEqual(context['low_stock_count'], 0)
+        self.assertEqual(context['daily_totals_json'], '[0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 400.0]')
+        self.assertEqual(context['top_items_labels_json'], '["Burger", "Cola"]')
+        self.assertEqual(
+            context['category_data'],
+            [{'label': 'Mains', 'value': 240.0}, {'label': 'Drinks', 'value': 160.0}],
+        )
+
+
+class AnalyticsIndexTests(TestCase):
+    def index_names(self, model, columns):
+        """Indexes of `model` whose leading columns are `columns`."""
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        return [
+            name for name, info in constraints.items()
+            if info['index'] and info['columns'][:len(columns)] == columns
+        ]
+
+    def assertUsesIndex(self, queryset, model, columns):
+        names = self.index_names(model, columns)
+        self.assertTrue(names, f"no index on {model.__name__}{tuple(columns)}")
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in names), plan)
+
+    def test_order_date_range(self):
+        start, end = day_bounds(date(2026, 2, 1), date(2026, 2, 7))
+        orders = CustomerOrder.objects.filter(order_datetime__gte=start, order_datetime__lt=end)
+        self.assertUsesIndex(orders, CustomerOrder, ['order_datetime'])
+
+    def test_order_items_by_order(self):
+        items = OrderItem.objects.filter(customer_order_id=1)
+        self.assertUsesIndex(items, OrderItem, ['customer_order_id'])
+
+    def test_order_items_by_menu_item(self):
+        items = OrderItem.objects.filter(menu_item_id=1)
+        self.assertUsesIndex(items, OrderItem, ['menu_item_id'])
+
+
+class SalesRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+        cls.soup = MenuItem.objects.create(name='Soup', price=Decimal('80.00'), category=mains)
+
+    def totals(self):
+        day = DailySales.objects.get()
+        hours = HourlySales.objects.values_list('order_count', 'total_amount', 'item_quantity').get()
+        items = dict(DailyItemSales.objects.values_list('menu_item__name', 'quantity'))
+        return (day.order_count, day.total_amount, day.item_quantity, day.cum_order_count), hours, items
+
+    def test_cancelled_orders_leave_the_rollups(self):
+        kept = place_order({self.burger.pk: 2})
+        cancelled = place_order({self.burger.pk: 1, self.soup.pk: 3})
+        cancel_orders([cancelled.pk])
+        cancel_orders([cancelled.pk])
+        expected = (
+            (1, Decimal('240.00'), 2, 1),
+            (1, Decimal('240.00'), 2),
+            {'Burger': 2, 'Soup': 0},
+        )
+        self.assertEqual(self.totals(), expected)
+
+        today = rollups.sales_date(kept.order_datetime)
+        rollups.rebuild(today, today)
+        rollups.refresh_running_totals()
+        self.assertEqual(self.totals(), (expected[0], expected[1], {'Burger': 2}))
+
+
+class SalesAnalyticsWindowTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_overlong_custom_range_falls_back(self):
+        response = self.client.get(
+            '/analytics/sales/', {'period': 'custom', 'start': '1900-01-01', 'end': '9999-12-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['period'], 'last_7_days')
+
+    def test_range_ending_on_the_last_date_falls_back(self):
+        params = {'period': 'custom', 'start': '9999-12-01', 'end': '9999-12-31'}
+        period, start, end = analytics.parse_window(params, date(2026, 2, 10))
+        self.assertEqual((period, start, end), ('last_7_days', date(2026, 2, 4), date(2026, 2, 10)))
+
+
+class OrderStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.bun = Ingredient.objects.create(name='Bun', unit_of_measure='pcs', current_stock_qty=Decimal('100'))
+        cls.patty = Ingredient.objects.create(name='Patty', unit_of_measure='pcs', current_stock_qty=Decimal('50'))
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+        Recipe.objects.create(menu_item=cls.burger, ingredient=cls.bun, quantity_required=Decimal('1'))
+        Recipe.objects.create(menu_item=cls.burger, ingredient=cls.patty, quantity_required=Decimal('2'))
+
+    def setUp(self):
+        cache.clear()
+
+    def stock(self):
+        """(current, reserved) stock of bun and patty."""
+        return list(
+            Ingredient.objects.filter(pk__in=[self.bun.pk, self.patty.pk])
+            .order_by('pk')
+            .values_list('current_stock_qty', 'reserved_stock_qty')
+        )
+
+    def test_order_form_deducts_every_recipe_ingredient(self):
+        slider = MenuItem.objects.create(name='Slider', price=Decimal('70.00'), category=self.burger.category)
+        Recipe.objects.create(menu_item=slider, ingredient=self.bun, quantity_required=Decimal('0.5'))
+        response = self.client.post('/order/new/', {f'item_{self.burger.pk}': '2', f'item_{slider.pk}': '4'})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+        order = CustomerOrder.objects.get()
+        self.assertEqual(order.total_amount, Decimal('520.00'))
+        self.assertCountEqual(
+            order.items.values_list('menu_item__name', 'quantity', 'line_amount'),
+            [('Burger', 2, Decimal('240.00')), ('Slider', 4, Decimal('280.00'))],
+        )
+        self.assertEqual(self.stock(), [(Decimal('96'), 0), (Decimal('46'), 0)])
+
+    def test_order_queries_do_not_grow_with_lines(self):
+        items = [self.burger] + [
+            MenuItem.objects.create(name=f'Side {n}', price=Decimal('10.00'), category=self.burger.category)
+            for n in range(5)
+        ]
+        for item in items[1:]:
+            Recipe.objects.create(menu_item=item, ingredient=self.bun, quantity_required=Decimal('1'))
+        place_order({item.pk: 1 for item in items})  # only steady-state orders are compared
+
+        with CaptureQueriesContext(connection) as one_line:
+            place_order({self.burger.pk: 1})
+        with CaptureQueriesContext(connection) as six_lines:
+            place_order({item.pk: 1 for item in items})
+        self.assertEqual(len(six_lines), len(one_line))
+
+    def test_recipe_edit_reaches_the_next_order(self):
+        place_order({self.burger.pk: 1})
+        response = self.client.post(
+            f'/menu/{self.burger.pk}/recipe/', {f'ing_{self.bun.pk}': '1', f'ing_{self.patty.pk}': '3'}
+        )
+        self.assertEqual(response.status_code, 302)
+        place_order({self.burger.pk: 1})
+        self.assertEqual(self.stock(), [(Decimal('98'), 0), (Decimal('45'), 0)])
+
+        Recipe.objects.get(ingredient=self.patty).delete()
+        place_order({self.burger.pk: 1})
+        self.assertEqual(self.stock(), [(Decimal('97'), 0), (Decimal('45'), 0)])
+
+    def test_bom_ttl_catches_edits_that_skip_signals(self):
+        place_order({self.burger.pk: 1})
+        Recipe.objects.filter(ingredient=self.patty).update(quantity_required=Decimal('3'))
+        place_order({self.burger.pk: 1})
+        self.assertEqual(self.stock(), [(Decimal('98'), 0), (Decimal('46'), 0)])
+        with override_settings(MINGOS_BOM_TTL_SECONDS=0):
+            place_order({self.burger.pk: 1})
+        self.assertEqual(self.stock(), [(Decimal('97'), 0), (Decimal('43'), 0)])
+
+    def test_cancelling_twice_restores_stock_once(self):
+        order = place_order({self.burger.pk: 3})
+        self.assertEqual(cancel_orders([order.pk]), [order.pk])
+        self.assertEqual(cancel_orders([order.pk]), [])
+        self.assertEqual(self.stock(), [(Decimal('100'), 0), (Decimal('50'), 0)])
+
+    def on_hand(self):
+        return list(
+            Ingredient.objects.with_stock().filter(pk__in=[self.bun.pk, self.patty.pk])
+            .order_by('pk')
+            .values_list('on_hand_qty', flat=True)
+        )
+
+    def test_cancel_gives_back_what_was_deducted(self):
+        order = place_order({self.burger.pk: 3})
+        Recipe.objects.filter(ingredient=self.patty).update(quantity_required=Decimal('5'))
+        cancel_orders([order.pk])
+        self.assertEqual(self.stock(), [(Decimal('100'), 0), (Decimal('50'), 0)])
+
+    @override_settings(MINGOS_STOCK_LEDGER=True)
+    def test_ledger_cancel_reverses_the_order_entries(self):
+        order = place_order({self.burger.pk: 3})
+        self.assertEqual(self.on_hand(), [Decimal('97'), Decimal('44')])
+        Recipe.objects.filter(ingredient=self.patty).update(quantity_required=Decimal('5'))
+        cancel_orders([order.pk])
+        self.assertEqual(self.on_hand(), [Decimal('100'), Decimal('50')])
+        restored = StockLedgerEntry.objects.filter(entry_type='ORDER_CANCELLED').values_list('quantity_change', flat=True)
+        self.assertEqual(sorted(restored), [Decimal('3'), Decimal('6')])
+
+    @override_settings(MINGOS_STOCK_LEDGER=True)
+    def test_ledger_reads_base_plus_tail_until_compacted(self):
+        place_order({self.burger.pk: 3})
+        place_order({self.burger.pk: 1})
+        self.assertEqual(self.stock(), [(Decimal('100'), 0), (Decimal('50'), 0)])
+        self.assertEqual(self.on_hand(), [Decimal('96'), Decimal('42')])
+
+        self.assertEqual(inventory.compact_stock_ledger(), (4, 2))
+        self.assertEqual(self.stock(), [(Decimal('96'), 0), (Decimal('42'), 0)])
+        self.assertEqual(self.on_hand(), [Decimal('96'), Decimal('42')])
+        self.assertFalse(StockLedgerEntry.objects.filter(folded=False).exists())
+        self.assertEqual(inventory.compact_stock_ledger(), (0, 0))
+
+    @override_settings(MINGOS_STOCK_LEDGER=True)
+    def test_admin_stock_edit_is_a_ledger_adjustment(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        place_order({self.burger.pk: 3})
+        response = self.client.post(f'/admin/mingos/ingredient/{self.bun.pk}/change/', {
+            'name': 'Bun', 'unit_of_measure': 'pcs', 'current_stock_qty': '110',
+            'safety_stock_qty': '0', 'reorder_level': '0', 'status': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        adjustment = StockLedgerEntry.objects.get(entry_type='ADJUSTMENT')
+        self.assertEqual(adjustment.quantity_change, Decimal('10'))
+        self.assertEqual(self.on_hand(), [Decimal('107'), Decimal('44')])
+
+        url = f'/admin/mingos/stockledgerentry/{adjustment.pk}/'
+        self.assertEqual(self.client.post(url + 'change/', {'quantity_change': '0'}).status_code, 403)
+        self.assertEqual(self.client.post(url + 'delete/', {'post': 'yes'}).status_code, 403)
+        self.assertEqual(StockLedgerEntry.objects.get(pk=adjustment.pk).quantity_change, Decimal('10'))
+
+    def test_hot_ingredient_stripes_fold_into_stock(self):
+        Ingredient.objects.filter(pk=self.bun.pk).update(is_hot=True)
+        inventory._hot_ingredients['loaded_at'] = None
+        self.addCleanup(inventory._hot_ingredients.update, loaded_at=None)
+        self.addCleanup(inventory._striped_ingredients.clear)
+
+        place_order({self.burger.pk: 3})
+        cancel_orders([place_order({self.burger.pk: 2}).pk])
+        self.assertEqual(self.stock(), [(Decimal('100'), 0), (Decimal('44'), 0)])
+        self.assertEqual(self.on_hand(), [Decimal('97'), Decimal('44')])
+
+        self.assertEqual(inventory.fold_stock_stripes(), 1)
+        self.assertEqual(self.stock(), [(Decimal('97'), 0), (Decimal('44'), 0)])
+        self.assertEqual(self.on_hand(), [Decimal('97'), Decimal('44')])
+        self.assertFalse(StockStripe.objects.exclude(quantity=0).exists())
+
+    @override_settings(MINGOS_DEFERRED_DEDUCTION=True)
+    def test_deferred_deductions_apply_when_drained(self):
+        place_order({self.burger.pk: 3})
+        self.assertEqual(self.on_hand(), [Decimal('100'), Decimal('50')])
+        self.assertEqual(inventory.drain_pending_deductions(), (2, 2))
+        self.assertEqual(self.on_hand(), [Decimal('97'), Decimal('44')])
+        self.assertEqual(inventory.drain_pending_deductions(), (0, 0))
+
+    @override_settings(MINGOS_DEFERRED_DEDUCTION=True)
+    def test_cancel_while_deductions_are_pending(self):
+        place_order({self.burger.pk: 1})
+        order = place_order({self.burger.pk: 3})
+        Recipe.objects.filter(ingredient=self.patty).update(quantity_required=Decimal('5'))
+        cancel_orders([order.pk])
+        inventory.drain_pending_deductions()
+        self.assertEqual(self.on_hand(), [Decimal('99'), Decimal('48')])
+        self.assertFalse(PendingDeduction.objects.exists())
+
+    @override_settings(MINGOS_RESERVE_STOCK=True)
+    def test_reserved_order_cancelled_twice_releases_once(self):
+        order = place_order({self.burger.pk: 3})
+        self.assertEqual(self.stock(), [(Decimal('100'), Decimal('3')), (Decimal('50'), Decimal('6'))])
+        self.assertEqual(cancel_orders([order.pk]), [order.pk])
+        self.assertEqual(cancel_orders([order.pk]), [])
+        self.assertEqual(self.stock(), [(Decimal('100'), 0), (Decimal('50'), 0)])
+        self.assertFalse(StockReservation.objects.exists())
+
+    @override_settings(MINGOS_RESERVE_STOCK=True)
+    def test_served_order_is_deducted_once_and_cannot_be_cancelled(self):
+        order = place_order({self.burger.pk: 3})
+        self.assertEqual(change_order_status([order.pk], 'SERVED'), [order.pk])
+        self.assertEqual(change_order_status([order.pk], 'SERVED'), [])
+        self.assertEqual(cancel_orders([order.pk]), [])
+        self.assertEqual(self.stock(), [(Decimal('97'), 0), (Decimal('44'), 0)])
+        self.assertFalse(StockReservation.objects.exists())
+
+
+@override_settings(MINGOS_TERMINAL_TOKEN='terminal-secret')
+class OrderBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+
+    def post(self, orders, content_type='application/json', token='terminal-secret'):
+        return self.client.post(
+            '/order/batch/', json.dumps({'orders': orders}), content_type=content_type,
+            headers={'X-Terminal-Token': token},
+        )
+
+    def test_only_terminals_can_post(self):
+        orders = [{'items': [{'menu_item_id': self.burger.pk, 'quantity': 1}]}]
+        self.assertEqual(self.post(orders, content_type='text/plain').status_code, 415)
+        self.assertEqual(self.post(orders, token='guess').status_code, 403)
+        with override_settings(MINGOS_TERMINAL_TOKEN=''):
+            self.assertEqual(self.post(orders, token='').status_code, 403)
+        self.assertFalse(CustomerOrder.objects.exists())
+
+    def test_malformed_items_are_rejected_per_order(self):
+        response = self.post([{'items': 5}, {'items': [{'menu_item_id': self.burger.pk, 'quantity': 1}]}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['status'] for row in response.json()['results']], ['rejected', 'created'])
+
+    def test_invalid_lines(self):
+        lines = [
+            {'menu_item_id': True, 'quantity': 1},
+            {'menu_item_id': self.burger.pk, 'quantity': True},
+            {'menu_item_id': self.burger.pk, 'quantity': MAX_LINE_QUANTITY + 1},
+        ]
+        drafts, errors, _ = build_order_drafts([{'items': [line]} for line in lines])
+        self.assertEqual(drafts, [None, None, None])
+        self.assertTrue(all(errors))
+
+    def test_quantity_cap_covers_repeated_lines(self):
+        line = {'menu_item_id': self.burger.pk, 'quantity': MAX_LINE_QUANTITY}
+        drafts, errors, _ = build_order_drafts([{'items': [line]}, {'items': [line, line]}])
+        self.assertEqual(drafts[0]['lines'], {self.burger.pk: MAX_LINE_QUANTITY})
+        self.assertIsNone(drafts[1])
+
+
+class SalesCubeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+        cls.soup = MenuItem.objects.create(name='Soup', price=Decimal('80.00'), category=mains)
+
+    def setUp(self):
+        cube._cube = None
+        self.addCleanup(setattr, cube, '_cube', None)
+
+    def rows(self):
+        rows = self.client.get('/analytics/cube/', {'measure': 'quantity'}).json()['rows']
+        return [(row['item'], row['value']) for row in rows]
+
+    def test_cancelled_orders_leave_the_cube(self):
+        cancelled = place_order({self.burger.pk: 2})
+        place_order({self.soup.pk: 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order({self.burger.pk: 1, self.soup.pk: 1})
+        self.assertEqual(self.rows(), [('Burger', 3), ('Soup', 2)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders([cancelled.pk])
+        self.assertEqual(self.rows(), [('Soup', 2), ('Burger', 1)])
+
+        cube._cube = None  # a fresh load leaves the cancelled order out too
+        self.assertEqual(self.rows(), [('Soup', 2), ('Burger', 1)])
+
+    def test_bad_filters_are_named(self):
+        for params, error in [
+            ({'item': 'abc'}, "item must be a menu item id, got 'abc'."),
+            ({'hour': '7pm'}, "hour must be an hour of the day, got '7pm'."),
+            ({'start': '2026-13-01'}, "start must be a YYYY-MM-DD date, got '2026-13-01'."),
+            ({'hour': '24'}, "Hours must be between 0 and 23."),
+        ]:
+            response = self.client.get('/analytics/cube/', params)
+            self.assertEqual((response.status_code, response.json()), (400, {'error': error}))
+
+
+class LiveTopItemsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+        cls.soup = MenuItem.objects.create(name='Soup', price=Decimal('80.00'), category=mains)
+
+    def setUp(self):
+        leaderboard._board = None
+        self.addCleanup(setattr, leaderboard, '_board', None)
+
+    def items(self):
+        items = self.client.get('/analytics/live/15/').json()['items']
+        return [(item['name'], item['quantity']) for item in items]
+
+    def test_cancelled_orders_leave_the_board(self):
+        loaded = place_order({self.burger.pk: 2})
+        self.assertEqual(self.items(), [('Burger', 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            fed = place_order({self.soup.pk: 3})
+        self.assertEqual(self.items(), [('Soup', 3), ('Burger', 2)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_orders([loaded.pk, fed.pk])
+        self.assertEqual(self.items(), [])
+
+        place_order({self.soup.pk: 1})
+        leaderboard._board = None  # a fresh load leaves the cancelled orders out too
+        self.assertEqual(self.items(), [('Soup', 1)])
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_lost_version_never_serves_old_entries(self):
+        self.assertEqual(analytics_cache.get_or_build('page', lambda: 'first'), 'first')
+        analytics_cache._bump()
+        self.assertEqual(analytics_cache.get_or_build('page', lambda: 'second'), 'second')
+
+        # The version key is evicted: whatever version comes back, no
+        # context built under an earlier one may be served.
+        analytics_cache._versions().delete(analytics_cache.VERSION_KEY)
+        self.assertEqual(analytics_cache.get_or_build('page', lambda: 'third'), 'third')
+
+
+@override_settings(MINGOS_TERMINAL_TOKEN='terminal-secret')
+class OrderCancelEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        cls.burger = MenuItem.objects.create(name='Burger', price=Decimal('120.00'), category=mains)
+
+    def post(self, order_ids, content_type='application/json', token='terminal-secret'):
+        return self.client.post(
+            '/order/cancel/', json.dumps({'order_ids': order_ids}), content_type=content_type,
+            headers={'X-Terminal-Token': token},
+        )
+
+    def test_only_terminals_can_cancel(self):
+        order = place_order({self.burger.pk: 1})
+        self.assertEqual(self.post([order.pk], content_type='text/plain').status_code, 415)
+        self.assertEqual(self.post([order.pk], token='guess').status_code, 403)
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, 'PENDING')
+
+        response = self.post([order.pk, order.pk + 1])
+        self.assertEqual(response.json(), {'cancelled': [order.pk], 'skipped': [order.pk + 1]})
+
+
+class ForecastingTests(SimpleTestCase):
+    def test_polynomial_forecast_extends_an_exact_fit(self):
+        days = np.arange(10)
+        matrix = np.array([2 + 3 * days + 0.5 * days ** 2, 5 - days, np.full(10, 4.0)])
+        np.testing.assert_allclose(forecasting.polynomial_forecast(matrix), [82, -5, 4], atol=1e-9)
+        np.testing.assert_allclose(forecasting.polynomial_forecast(matrix, steps=3), [110, -7, 4], atol=1e-9)
+        np.testing.assert_allclose(forecasting.polynomial_forecast(matrix, degree=1)[1:], [-5, 4], atol=1e-9)
+
+    def test_backtest_errors_on_a_tiny_history(self):
+        # Two items over nine days; the last two are predicted from the
+        # seven before each. Item 2 sells once, on the first predicted day.
+        matrix = np.array([[4.0] * 9, [0.0] * 7 + [2.0, 0.0]])
+        totals = forecasting.backtest_errors(matrix, date(2026, 2, 2), window=7)
+        self.assertEqual(set(totals), set(forecasting.FORECASTERS))
+        for name in ('moving_average', 'same_weekday'):
+            abs_error, pct_error, sold_days = totals[name]
+            np.testing.assert_array_equal(abs_error, [0, 2])
+            np.testing.assert_array_equal(pct_error, [0, 100])
+            np.testing.assert_array_equal(sold_days, [2, 1])
+        self.assertEqual(totals['poly2'][0][0], 0)
+
+
+class PurchaseSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.flour, cls.salt, cls.oil = (
+            Ingredient.objects.create(name=name, unit_of_measure='kg', reorder_level=Decimal(level))
+            for name, level in [('Flour', '10'), ('Salt', '3'), ('Oil', '2')]
+        )
+        Ingredient.objects.create(name='Sugar', unit_of_measure='kg', current_stock_qty=50, reorder_level=10)
+        cls.a, cls.b, cls.c, cls.d = (
+            Supplier.objects.create(name=name, status=status)
+            for name, status in [('A', 'Active'), ('B', 'Inactive'), ('C', 'Active'), ('D', None)]
+        )
+        # A's latest price ties with C's; B is cheaper but inactive; D was never bought from.
+        for supplier, ingredient, price in [
+            (cls.a, cls.flour, '3.00'), (cls.a, cls.flour, '5.00'), (cls.b, cls.flour, '4.00'),
+            (cls.c, cls.flour, '5.00'), (cls.b, cls.oil, '1.00'),
+        ]:
+            po = PurchaseOrder.objects.create(supplier=supplier, order_date=date(2026, 2, 1), status='Delivered')
+            PurchaseOrderLine.objects.create(
+                purchase_order=po, line_no=1, ingredient=ingredient, ordered_qty=1, received_qty=1,
+                unit_price=Decimal(price), line_amount=Decimal(price),
+            )
+        for supplier in (cls.d, cls.c, cls.b, cls.a):
+            SupplierIngredient.objects.create(supplier=supplier, ingredient=cls.flour)
+        SupplierIngredient.objects.create(supplier=cls.d, ingredient=cls.salt)
+        SupplierIngredient.objects.create(supplier=cls.b, ingredient=cls.oil)
+
+    def test_cheapest_active_supplier_wins(self):
+        drafts, unsupplied = suggest_purchases(date(2026, 2, 10))
+        lines = [
+            (draft['supplier'], line['name'], line['quantity'], line['unit_price'])
+            for draft in drafts for line in draft['lines']
+        ]
+        self.assertEqual(lines, [
+            ('A', 'Flour', Decimal('10'), Decimal('5.00')),
+            ('D', 'Salt', Decimal('3'), Decimal('0.00')),
+        ])
+        self.assertEqual([(item['name'], item['quantity']) for item in unsupplied], [('Oil', Decimal('2'))])
@@ -3,13 +3,23 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('dashboard/charts/<slug:series>/', views.dashboard_chart, name='dashboard_chart'),
     path('analytics/sales/', views.sales_analytics, name='sales_analytics'),
+    path('analytics/sales/charts/<slug:series>/', views.sales_chart, name='sales_chart'),
+    path('analytics/cube/', views.sales_cube, name='sales_cube'),
+    path('analytics/live/<int:minutes>/', views.live_top_items, name='live_top_items'),
     path('analytics/inventory/', views.inventory_analytics, name='inventory_analytics'),
+    path('purchase-orders/suggest/', views.suggest_purchase_orders, name='suggest_purchase_orders'),
+    path('purchase-orders/confirm/', views.confirm_purchase_orders, name='confirm_purchase_orders'),
     path('menu/', views.menu_list, name='menu_list'),
     path('order/new/', views.create_order, name='create_order'),
+    path('order/batch/', views.create_orders_batch, name='create_orders_batch'),
+    path('order/cancel/', views.cancel_orders_batch, name='cancel_orders_batch'),
     path('orders/recent/', views.recent_orders, name='recent_orders'),
+    path('orders/status/', views.update_order_status, name='update_order_status'),
     path('menu/<int:item_id>/recipe/', views.recipe_view_edit, name='recipe_view_edit'),
     path('menu/<int:item_id>/recipe/view/', views.recipe_detail, name='recipe_detail'),
     path('reports/', views.report_generation, name='report_generation'),
     path('reports/generate-pdf/', views.generate_report_pdf, name='generate_report_pdf'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
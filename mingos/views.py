@@ -1,16 +1,29 @@
 from django.shortcuts import render, redirect
 from django.db import transaction, models
-from django.db.models import Sum, Count, F, Case, When, Value, FloatField
+from django.db.models import Sum, F, Q, Max, Case, When, Value, FloatField
 from django.shortcuts import get_object_or_404
 from django.contrib import messages
-from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.http import HttpResponse, JsonResponse
 import json
-from datetime import timedelta, datetime
-from django.utils.timezone import now
-from .models import CustomerOrder, OrderItem, Ingredient, MenuItem, MenuCategory, PurchaseOrder, Recipe
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
+from collections import defaultdict
+from functools import wraps
+from datetime import date, timedelta, datetime
+import time
+from django.utils.timezone import localdate, localtime
+from .models import (
+    CustomerOrder, Ingredient, MenuItem, MenuCategory, PurchaseOrder, Recipe,
+    DailySales, DailyItemSales,
+)
+from .orders import (
+    MAX_BATCH_ORDERS, build_order_drafts, cancel_orders, change_order_status,
+    parse_order_lines, place_order, place_orders,
+)
+from . import analytics, analytics_cache, bom, cube, forecasting, leaderboard, projection, purchasing, retry
+from .inventory import pending_deduction_stats
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -23,174 +36,72 @@ from reportlab.graphics.charts.piecharts import Pie
 from io import BytesIO
 
 
-def _get_last_7_days_sales():
-    today = now().date()
-    start_date = today - timedelta(days=6)
-
-    # Get actual sales data
-    qs = (
-        CustomerOrder.objects
-        .filter(order_datetime__date__gte=start_date, order_datetime__date__lte=today)
-        .extra({'date': 'DATE(order_datetime)'})
-        .values('date')
-        .annotate(
-            total_sales=Sum('total_amount'),
-            order_count=Count('order_id')
-        )
-        .order_by('date')
-    )
-
-    # Create a dict of sales by date
-    sales_by_date = {row['date']: {'sales': float(row['total_sales'] or 0), 'count': row['order_count']} for row in qs}
-
-    # Generate all 7 days
-    labels = []
-    totals = []
-    counts = []
-    
-    for i in range(7):
-        date = start_date + timedelta(days=i)
-        labels.append(date.strftime('%d %b'))
-        
-        if date in sales_by_date:
-            totals.append(sales_by_date[date]['sales'])
-            counts.append(sales_by_date[date]['count'])
-        else:
-            totals.append(0)
-            counts.append(0)
-
-    return labels, totals, counts
-
-
-def _predict_next_day_sales():
+def _dashboard_sales_summary(days=7):
     """
-    Use ML to predict quantities of each menu item for the next day.
-    Returns a dict: {menu_item_id: predicted_quantity}
+    All-time revenue and order count plus the per-day series of the last
+    `days` days, in one conditional aggregation over DailySales.
     """
-    try:
-        today = now().date()
-        start_date = today - timedelta(days=30)  # Use last 30 days of data
-        
-        # Get historical daily sales by menu item
-        daily_sales = (
-            OrderItem.objects
-            .filter(customer_order__order_datetime__date__gte=start_date)
-            .values('menu_item_id', 'menu_item__name')
-            .annotate(date=F('customer_order__order_datetime__date'))
-            .values('date', 'menu_item_id', 'menu_item__name')
-            .annotate(total_qty=Sum('quantity'))
-            .order_by('date', 'menu_item_id')
-        )
-        
-        predictions = {}
-        
-        # Group by menu item and predict
-        menu_items_dict = {}
-        for sale in daily_sales:
-            item_id = sale['menu_item_id']
-            date = sale['date']
-            qty = sale['total_qty'] or 0
-            
-            if item_id not in menu_items_dict:
-                menu_items_dict[item_id] = {
-                    'name': sale['menu_item__name'],
-                    'dates': [],
-                    'quantities': []
-                }
-            
-            menu_items_dict[item_id]['dates'].append(date)
-            menu_items_dict[item_id]['quantities'].append(qty)
-        
-        # Train model for each menu item
-        for item_id, data in menu_items_dict.items():
-            if len(data['quantities']) < 3:  # Need at least 3 data points
-                # Use average if not enough data
-                predictions[item_id] = {
-                    'predicted_qty': int(np.mean(data['quantities'])),
-                    'name': data['name'],
-                    'confidence': 'low'
-                }
-                continue
-            
-            try:
-                # Prepare data for ML model
-                X = np.arange(len(data['quantities'])).reshape(-1, 1)
-                y = np.array(data['quantities'])
-                
-                # Use polynomial regression for better trend capture
-                poly = PolynomialFeatures(degree=2)
-                X_poly = poly.fit_transform(X)
-                
-                model = LinearRegression()
-                model.fit(X_poly, y)
-                
-                # Predict for next day (index = len(data))
-                next_day_X = np.array([[len(data['quantities'])]]).reshape(-1, 1)
-                next_day_X_poly = poly.transform(next_day_X)
-                predicted_qty = model.predict(next_day_X_poly)[0]
-                
-                # Ensure non-negative prediction
-                predicted_qty = max(0, int(round(predicted_qty)))
-                
-                predictions[item_id] = {
-                    'predicted_qty': predicted_qty,
-                    'name': data['name'],
-                    'confidence': 'high',
-                    'avg_daily_sales': int(np.mean(data['quantities']))
-                }
-            except:
-                # Fallback to average
-                predictions[item_id] = {
-                    'predicted_qty': int(np.mean(data['quantities'])),
-                    'name': data['name'],
-                    'confidence': 'low'
-                }
-        
-        return predictions
-    except Exception as e:
-        print(f"Prediction error: {e}")
-        return {}
-
+    today = localdate()
+    dates = [today - timedelta(days=days - 1 - i) for i in range(days)]
+    aggregates = {'revenue': Sum('total_amount'), 'orders': Sum('order_count')}
+    for i, date in enumerate(dates):
+        aggregates[f'sales_{i}'] = Sum('total_amount', filter=Q(sales_date=date))
+        aggregates[f'count_{i}'] = Sum('order_count', filter=Q(sales_date=date))
+    row = DailySales.objects.aggregate(**aggregates)
+
+    return {
+        'revenue': row['revenue'] or 0,
+        'orders': row['orders'] or 0,
+        'labels': [date.strftime('%d %b') for date in dates],
+        'totals': [float(row[f'sales_{i}'] or 0) for i in range(days)],
+        'counts': [row[f'count_{i}'] or 0 for i in range(days)],
+    }
 
-def dashboard(request):
-    # High-level KPIs
-    total_revenue = CustomerOrder.objects.aggregate(s=Sum('total_amount'))['s'] or 0
-    total_orders = CustomerOrder.objects.count()
-    total_menu_items = MenuItem.objects.count()
-    low_stock_count = Ingredient.objects.filter(current_stock_qty__lt=F('reorder_level')).count()
 
-    # Daily sales (last 7 days)
-    daily_labels, daily_totals, daily_counts = _get_last_7_days_sales()
+def _dashboard_context():
+    # High-level KPIs and daily sales (last 7 days)
+    summary = _dashboard_sales_summary()
+    total_revenue = summary['revenue']
+    total_orders = summary['orders']
+    daily_labels, daily_totals = summary['labels'], summary['totals']
+    low_stock_count = Ingredient.objects.with_stock().filter(available_qty__lt=F('reorder_level')).count()
 
-    # Top 5 selling items by revenue
-    top_items = (
-        OrderItem.objects
-        .values('menu_item__name')
+    # One row per menu item: gives the menu item count, the top items
+    # and the category breakdown without further queries.
+    item_rows = list(
+        MenuItem.objects
+        .values('pk', 'name', 'category__name')
         .annotate(
-            total_qty=Sum('quantity'),
-            total_sales=Sum('line_amount')
+            total_qty=Sum('daily_sales__quantity'),
+            total_sales=Sum('daily_sales__revenue')
         )
-        .order_by('-total_sales')[:5]
     )
-    top_items_labels = [row['menu_item__name'] for row in top_items]
-    top_items_sales = [float(row['total_sales'] or 0) for row in top_items]
+    total_menu_items = len(item_rows)
+    sold = sorted(
+        (row for row in item_rows if row['total_qty']),
+        key=lambda row: row['total_sales'],
+        reverse=True,
+    )
+
+    # Top 5 selling items by revenue
+    top_items = sold[:5]
+    top_items_labels = [row['name'] for row in top_items]
+    top_items_sales = [float(row['total_sales']) for row in top_items]
 
     # Category-wise revenue
-    category_sales_qs = (
-        OrderItem.objects
-        .values('menu_item__category__name')
-        .annotate(total_sales=Sum('line_amount'))
-        .order_by('-total_sales')
-    )
-    category_labels = [row['menu_item__category__name'] or 'Uncategorized' for row in category_sales_qs]
-    category_values = [float(row['total_sales'] or 0) for row in category_sales_qs]
+    category_totals = defaultdict(float)
+    for row in sold:
+        category_totals[row['category__name'] or 'Uncategorized'] += float(row['total_sales'])
+    category_sales = sorted(category_totals.items(), key=lambda pair: pair[1], reverse=True)
+    category_labels = [label for label, value in category_sales]
+    category_values = [value for label, value in category_sales]
     category_data = [
         {"label": label, "value": value}
         for label, value in zip(category_labels, category_values)
     ]
 
-    # ML Predictions for next day
-    next_day_predictions = _predict_next_day_sales()
+    # Next-day forecast for every item sold recently
+    next_day_predictions = forecasting.next_day_predictions()
     predicted_items = []
     for item_id, pred_data in next_day_predictions.items():
         predicted_items.append({
@@ -202,6 +113,11 @@ def dashboard(request):
         })
     predicted_items.sort(key=lambda x: x['predicted_qty'], reverse=True)
 
+    charts = {
+        "daily": {"labels": daily_labels, "totals": daily_totals},
+        "top_items": {"labels": top_items_labels, "sales": top_items_sales},
+        "categories": {"labels": category_labels, "values": category_values},
+    }
     context = {
         "total_revenue": float(total_revenue),
         "total_orders": total_orders,
@@ -215,39 +131,179 @@ def dashboard(request):
         "category_labels_json": json.dumps(category_labels),
         "category_values_json": json.dumps(category_values),
         "predicted_items": predicted_items,
+        "charts": charts,
     }
-    return render(request, "mingos/dashboard.html", context)
+    return context
 
 
-def sales_analytics(request):
-    daily_labels, daily_totals, daily_counts = _get_last_7_days_sales()
+def dashboard(request):
+    context = analytics_cache.get_or_build('dashboard', _dashboard_context)
+    return render(request, "mingos/dashboard.html", context)
 
-    top_items = (
-        OrderItem.objects
-        .values('menu_item__name')
-        .annotate(
-            total_qty=Sum('quantity'),
-            total_sales=Sum('line_amount')
-        )
-        .order_by('-total_sales')[:10]
-    )
+
+def _sales_analytics_context(start, end):
+    daily_labels, daily_totals = analytics.daily_series(start, end)
+    heatmap = analytics.weekday_hour_heatmap(start, end)
 
     context = {
-        "top_items": top_items,
+        "comparison": analytics.compare_windows(start, end),
+        "top_items": analytics.top_items(start, end),
         "daily_labels_json": json.dumps(daily_labels),
         "daily_totals_json": json.dumps(daily_totals),
+        "heatmap_json": json.dumps(heatmap),
+        "charts": {
+            "daily": {"labels": daily_labels, "totals": daily_totals},
+            "heatmap": heatmap,
+        },
+    }
+    return context
+
+
+def _sales_analytics_window(request):
+    """The cached sales analytics context of the window in the request, with its period and dates."""
+    period, start, end = analytics.parse_window(request.GET, localdate())
+    context = analytics_cache.get_or_build(
+        f'sales_analytics:{start}:{end}', lambda: _sales_analytics_context(start, end)
+    )
+    return period, start, end, context
+
+
+def _latest_order(request):
+    """Id and timestamp of the newest order, read once per request (two index lookups)."""
+    if not hasattr(request, '_latest_order'):
+        request._latest_order = CustomerOrder.objects.aggregate(
+            order_id=Max('order_id'), order_datetime=Max('order_datetime')
+        )
+    return request._latest_order
+
+
+def _chart_etag(request, *args, **kwargs):
+    # The data version also moves on cancellations, stock and recipe
+    # changes; the date rolls date-relative series over at midnight.
+    latest = _latest_order(request)
+    return f"{latest['order_id'] or 0}-{analytics_cache.data_version()}-{localdate()}"
+
+
+def _chart_last_modified(request, *args, **kwargs):
+    return _latest_order(request)['order_datetime']
+
+
+def _chart_response(charts, series):
+    if series not in charts:
+        return JsonResponse({"error": f"Unknown chart {series!r}.", "charts": sorted(charts)}, status=404)
+    response = JsonResponse(charts[series])
+    # Let clients keep the body but revalidate it on every poll.
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@require_GET
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def dashboard_chart(request, series):
+    """One dashboard chart series as JSON (daily, top_items or categories); 304 when unchanged."""
+    return _chart_response(analytics_cache.get_or_build('dashboard', _dashboard_context)["charts"], series)
+
+
+@require_GET
+@condition(etag_func=_chart_etag, last_modified_func=_chart_last_modified)
+def sales_chart(request, series):
+    """
+    One sales analytics chart series (daily or heatmap) for the window in
+    the query string, as JSON; 304 when unchanged.
+    """
+    period, start, end, context = _sales_analytics_window(request)
+    return _chart_response(context["charts"], series)
+
+
+def sales_analytics(request):
+    """
+    Sales for any date window (a named period or a custom range picked on
+    the page), compared with the window of the same length just before it.
+    """
+    period, start, end, context = _sales_analytics_window(request)
+    context = {
+        **context,
+        "period": period,
+        "periods": analytics.PERIODS,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
     }
     return render(request, "mingos/sales_analytics.html", context)
 
 
+def _cube_param(value, parse, name, expected):
+    """Parse one sales cube query parameter; a bad value names the parameter."""
+    if value is None:
+        return None
+    try:
+        return parse(value)
+    except ValueError:
+        raise ValueError(f"{name} must be {expected}, got {value!r}.") from None
+
+
+def sales_cube(request):
+    """
+    Slice the in-memory sales cube, as JSON. Parameters:
+      measure     quantity or revenue (default revenue)
+      by          comma-separated dimensions: item or category, day or
+                  weekday, hour, order_type (default item)
+      start, end  YYYY-MM-DD bounds (inclusive)
+      item, category, hour, order_type   filters, repeatable
+      limit       maximum number of rows (default 1000)
+    """
+    params = request.GET
+    try:
+        start = _cube_param(params.get('start') or None, date.fromisoformat, 'start', 'a YYYY-MM-DD date')
+        end = _cube_param(params.get('end') or None, date.fromisoformat, 'end', 'a YYYY-MM-DD date')
+        group_by = [name for name in params.get('by', 'item').split(',') if name]
+        filters = {
+            'items': [_cube_param(pk, int, 'item', 'a menu item id') for pk in params.getlist('item')],
+            'categories': params.getlist('category'),
+            'hours': [_cube_param(hour, int, 'hour', 'an hour of the day') for hour in params.getlist('hour')],
+            'order_types': params.getlist('order_type'),
+        }
+        limit = _cube_param(params.get('limit', '1000'), int, 'limit', 'a whole number')
+        started = time.perf_counter()
+        first_day, rows, total = cube.query(
+            measure=params.get('measure', 'revenue'), group_by=group_by,
+            start=start, end=end, limit=limit, **filters
+        )
+        elapsed = time.perf_counter() - started
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({
+        "measure": params.get('measure', 'revenue'),
+        "group_by": group_by,
+        "first_day": first_day.isoformat(),
+        "total": total,
+        "rows": rows,
+        "elapsed_microseconds": round(elapsed * 1e6, 1),
+    })
+
+
+def live_top_items(request, minutes):
+    """
+    Best-selling menu items of the last 15, 60 or 240 minutes, as JSON,
+    from the in-memory leaderboard. `k` sets how many (default 5, max 50).
+    """
+    try:
+        k = min(max(int(request.GET.get('k', 5)), 1), 50)
+        items = leaderboard.top_items(minutes, k)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"minutes": minutes, "items": items})
+
+
 def inventory_analytics(request):
     # Get all ingredients with stock status
     all_ingredients = (
         Ingredient.objects
+        .with_stock()
         .annotate(
             stock_percentage=Case(
                 When(reorder_level__gt=0, then=(
-                    F('current_stock_qty') * 100 / F('reorder_level')
+                    F('available_qty') * 100 / F('reorder_level')
                 )),
                 default=Value(100),
                 output_field=FloatField()
@@ -256,7 +312,7 @@ def inventory_analytics(request):
         .order_by('name')
     )
     
-    low_stock = all_ingredients.filter(current_stock_qty__lt=F('reorder_level'))
+    low_stock = all_ingredients.filter(available_qty__lt=F('reorder_level'))
     low_stock_count = low_stock.count()
     
     # Calculate total inventory value (you can add cost per unit later)
@@ -268,15 +324,50 @@ def inventory_analytics(request):
         .order_by('-order_date')[:10]
     )
 
+    # Projected use follows forecasts, recipes and stock, all of which
+    # bump the analytics data version.
+    demand = analytics_cache.get_or_build('ingredient_demand', projection.ingredient_demand)
+
     context = {
         "all_ingredients": all_ingredients,
         "low_stock_count": low_stock_count,
         "total_items": total_items,
         "recent_pos": recent_pos,
+        "demand": [row for row in demand if row['days_of_cover'] is not None],
+        "draft_pos": (
+            PurchaseOrder.objects
+            .filter(status=purchasing.DRAFT)
+            .select_related('supplier')
+            .prefetch_related('lines__ingredient')
+            .order_by('supplier__name')
+        ),
     }
     return render(request, "mingos/inventory_analytics.html", context)
 
 
+@require_POST
+def suggest_purchase_orders(request):
+    """Replace the draft purchase orders with fresh suggestions."""
+    pos, unsupplied = purchasing.create_draft_purchase_orders()
+    messages.success(request, f"✅ {len(pos)} draft purchase order(s) suggested.")
+    if unsupplied:
+        names = ", ".join(row['name'] for row in unsupplied)
+        messages.warning(request, f"No supplier linked for: {names}.")
+    return redirect('inventory_analytics')
+
+
+@require_POST
+def confirm_purchase_orders(request):
+    """Bulk-confirm the draft purchase orders ticked on the inventory page."""
+    po_ids = [int(pk) for pk in request.POST.getlist('po_ids') if pk.isdigit()]
+    if not po_ids:
+        messages.warning(request, "Select at least one draft purchase order.")
+    else:
+        count = purchasing.confirm_purchase_orders(po_ids)
+        messages.success(request, f"✅ {count} purchase order(s) confirmed.")
+    return redirect('inventory_analytics')
+
+
 def menu_list(request):
     """
     Show all menu categories and items in a clean list.
@@ -285,7 +376,6 @@ def menu_list(request):
     return render(request, 'mingos/menu_list.html', {'categories': categories})
 
 
-@transaction.atomic
 def create_order(request):
     """
     Simple order creation
@@ -294,56 +384,10 @@ def create_order(request):
            Also automatically reduces inventory based on recipes
     """
     if request.method == 'POST':
-        items = []
-        total_amount = 0
-
-        for key, value in request.POST.items():
-            if key.startswith('item_') and value.strip():
-                try:
-                    qty = int(value)
-                except ValueError:
-                    continue
-                if qty <= 0:
-                    continue
-
-                menu_item_id = key.split('_', 1)[1]
-                try:
-                    menu_item = MenuItem.objects.get(pk=menu_item_id)
-                except MenuItem.DoesNotExist:
-                    continue
-
-                line_amount = menu_item.price * qty
-                items.append((menu_item, qty, line_amount))
-                total_amount += line_amount
-
-        if items:
-            # Create order
-            order = CustomerOrder.objects.create(
-                total_amount=total_amount,
-                order_status='PENDING'
-            )
-            
-            # Add order items and reduce inventory
-            for menu_item, qty, line_amount in items:
-                OrderItem.objects.create(
-                    customer_order=order,
-                    menu_item=menu_item,
-                    quantity=qty,
-                    unit_price=menu_item.price,
-                    line_amount=line_amount,
-                )
-                
-                # Reduce inventory based on recipe
-                recipes = Recipe.objects.filter(menu_item=menu_item).select_related('ingredient')
-                for recipe in recipes:
-                    ingredient_qty_needed = recipe.quantity_required * qty
-                    ingredient = recipe.ingredient
-                    
-                    # Deduct from inventory
-                    ingredient.current_stock_qty = F('current_stock_qty') - ingredient_qty_needed
-                    ingredient.save(update_fields=['current_stock_qty'])
-                    ingredient.refresh_from_db()  # Reload to get actual value
+        lines = parse_order_lines(request.POST)
+        order = place_order(lines) if lines else None
 
+        if order is not None:
             messages.success(request, f"✅ Order #{order.order_id} created successfully! Inventory updated.")
             return redirect('dashboard')
 
@@ -380,16 +424,106 @@ def create_order(request):
     })
 
 
+def terminal_endpoint(view):
+    """
+    Open a JSON view to POS terminals instead of browser sessions: no CSRF
+    token, but only application/json POSTs (which a cross-site page cannot
+    send without a CORS preflight) carrying settings.MINGOS_TERMINAL_TOKEN
+    in the X-Terminal-Token header. Closed while no token is configured.
+    """
+    @csrf_exempt
+    @require_POST
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.content_type != 'application/json':
+            return JsonResponse({"error": "Content-Type must be application/json."}, status=415)
+        token = getattr(settings, 'MINGOS_TERMINAL_TOKEN', '')
+        if not token or not constant_time_compare(request.headers.get('X-Terminal-Token', ''), token):
+            return JsonResponse({"error": "A valid X-Terminal-Token header is required."}, status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@terminal_endpoint
+def create_orders_batch(request):
+    """
+    JSON batch ingestion for POS terminals flushing queued orders
+    (see terminal_endpoint for authentication).
+    POST {"orders": [{"ref": ..., "order_datetime": ..., "order_type": ...,
+                      "payment_mode": ..., "items": [{"menu_item_id": ..., "quantity": ...}]}]}
+    Valid orders are inserted together in one transaction; the response
+    reports created/rejected per submitted order, in the same order.
+    """
+    try:
+        submitted = json.loads(request.body)['orders']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON object with an "orders" list.'}, status=400)
+    if not isinstance(submitted, list):
+        return JsonResponse({"error": '"orders" must be a list.'}, status=400)
+    if len(submitted) > MAX_BATCH_ORDERS:
+        return JsonResponse({"error": f"At most {MAX_BATCH_ORDERS} orders per batch."}, status=400)
+
+    drafts, errors, menu_items = build_order_drafts(submitted)
+    valid = [draft for draft in drafts if draft is not None]
+    created = iter(place_orders(valid, menu_items) if valid else [])
+
+    results = []
+    for index, (entry, draft, problems) in enumerate(zip(submitted, drafts, errors)):
+        ref = entry.get('ref') if isinstance(entry, dict) else None
+        if draft is None:
+            results.append({"index": index, "ref": ref, "status": "rejected", "errors": problems})
+        else:
+            order = next(created)
+            results.append({
+                "index": index,
+                "ref": ref,
+                "status": "created",
+                "order_id": order.order_id,
+                "total_amount": str(order.total_amount),
+            })
+
+    return JsonResponse({
+        "created": len(valid),
+        "rejected": len(submitted) - len(valid),
+        "results": results,
+    })
+
+
+@terminal_endpoint
+def cancel_orders_batch(request):
+    """
+    JSON batch cancellation for POS terminals (see terminal_endpoint for
+    authentication).
+    POST {"order_ids": [...]}
+    All orders are cancelled in one transaction and their ingredients given
+    back to stock. Orders already cancelled or served are reported as
+    skipped, so the same request can safely be sent again.
+    """
+    try:
+        order_ids = json.loads(request.body)['order_ids']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON object with an "order_ids" list.'}, status=400)
+    if not isinstance(order_ids, list) or not all(isinstance(pk, int) for pk in order_ids):
+        return JsonResponse({"error": '"order_ids" must be a list of integers.'}, status=400)
+    if len(order_ids) > MAX_BATCH_ORDERS:
+        return JsonResponse({"error": f"At most {MAX_BATCH_ORDERS} orders per batch."}, status=400)
+
+    cancelled = cancel_orders(order_ids)
+    done = set(cancelled)
+    return JsonResponse({
+        "cancelled": cancelled,
+        "skipped": [pk for pk in dict.fromkeys(order_ids) if pk not in done],
+    })
+
+
 def recent_orders(request):
     """
     Show the most recent customer orders with a quick breakdown of items.
     """
+    # item_count and total_qty are stored on the order, so this is a read
+    # of the order_datetime index plus one prefetch for the detail rows.
     orders = (
         CustomerOrder.objects
-        .annotate(
-            item_count=Count('items'),
-            total_qty=Sum('items__quantity'),
-        )
         .order_by('-order_datetime')
         .prefetch_related('items__menu_item')[:20]
     )
@@ -400,6 +534,31 @@ def recent_orders(request):
     return render(request, "mingos/recent_orders.html", context)
 
 
+@require_POST
+def update_order_status(request):
+    """
+    Bulk status change from the recent orders page, e.g. the kitchen
+    marking every ticket on the pass as served in one go.
+    """
+    new_status = request.POST.get('status')
+    order_ids = [int(pk) for pk in request.POST.getlist('order_ids') if pk.isdigit()]
+
+    if not order_ids:
+        messages.warning(request, "Select at least one order.")
+    else:
+        try:
+            moved = change_order_status(order_ids, new_status)
+        except ValueError as exc:
+            messages.error(request, str(exc))
+        else:
+            skipped = len(order_ids) - len(moved)
+            messages.success(request, f"✅ {len(moved)} order(s) marked {new_status.lower()}.")
+            if skipped:
+                messages.warning(request, f"{skipped} order(s) skipped: their status does not allow this change.")
+
+    return redirect('recent_orders')
+
+
 @transaction.atomic
 def recipe_view_edit(request, item_id):
     menu_item = get_object_or_404(MenuItem, pk=item_id)
@@ -460,7 +619,7 @@ def recipe_detail(request, item_id):
 
 def report_generation(request):
     """Report generation page with date range selection"""
-    today = now().date()
+    today = localdate()
     default_start = today - timedelta(days=7)
     
     return render(request, 'mingos/report_generation.html', {
@@ -481,7 +640,7 @@ def generate_report_pdf(request):
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
     except:
         # Default to last 7 days if invalid dates
-        end_date = now().date()
+        end_date = localdate()
         start_date = end_date - timedelta(days=7)
     
     # Create response
@@ -517,17 +676,16 @@ def generate_report_pdf(request):
     elements.append(Paragraph(f"<b>{report_title}</b>", title_style))
     elements.append(Paragraph(f"<b>Mingos Canteen Management System</b>", styles['Heading3']))
     elements.append(Paragraph(f"Period: {start_date.strftime('%B %d, %Y')} to {end_date.strftime('%B %d, %Y')}", normal_style))
-    elements.append(Paragraph(f"Generated on: {now().strftime('%B %d, %Y at %I:%M %p')}", normal_style))
+    elements.append(Paragraph(f"Generated on: {localtime().strftime('%B %d, %Y at %I:%M %p')}", normal_style))
     elements.append(Spacer(1, 0.3*inch))
     
-    # Query data for date range
-    orders = CustomerOrder.objects.filter(
-        order_datetime__date__gte=start_date,
-        order_datetime__date__lte=end_date
-    )
+    # Query data for date range from the daily rollups
+    days = DailySales.objects.filter(sales_date__range=(start_date, end_date))
+    item_sales = DailyItemSales.objects.filter(sales_date__range=(start_date, end_date))
     
-    total_revenue = orders.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-    total_orders = orders.count()
+    totals = days.aggregate(revenue=Sum('total_amount'), orders=Sum('order_count'))
+    total_revenue = totals['revenue'] or 0
+    total_orders = totals['orders'] or 0
     avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
     
     # Summary Section
@@ -560,15 +718,8 @@ def generate_report_pdf(request):
         daily_sales[current_date] = 0
         current_date += timedelta(days=1)
     
-    daily_data = (
-        orders.extra({'date': 'DATE(order_datetime)'})
-        .values('date')
-        .annotate(total=Sum('total_amount'))
-        .order_by('date')
-    )
-    
-    for row in daily_data:
-        daily_sales[row['date']] = float(row['total'] or 0)
+    for row in days:
+        daily_sales[row.sales_date] = float(row.total_amount)
     
     # Daily Revenue Chart
     if len(daily_sales) > 0:
@@ -593,11 +744,11 @@ def generate_report_pdf(request):
     elements.append(Paragraph("<b>Top Selling Items</b>", heading_style))
     
     top_items = (
-        OrderItem.objects.filter(customer_order__in=orders)
+        item_sales
         .values('menu_item__name')
         .annotate(
             total_qty=Sum('quantity'),
-            total_sales=Sum('line_amount')
+            total_sales=Sum('revenue')
         )
         .order_by('-total_sales')[:10]
     )
@@ -634,9 +785,9 @@ def generate_report_pdf(request):
     elements.append(Paragraph("<b>Category-wise Performance</b>", heading_style))
     
     category_data = (
-        OrderItem.objects.filter(customer_order__in=orders)
+        item_sales
         .values('menu_item__category__name')
-        .annotate(total=Sum('line_amount'))
+        .annotate(total=Sum('revenue'))
         .order_by('-total')
     )
     
@@ -668,29 +819,29 @@ def generate_report_pdf(request):
     # Inventory Status
     elements.append(Paragraph("<b>Current Inventory Status</b>", heading_style))
     
-    all_ingredients = Ingredient.objects.annotate(
+    all_ingredients = Ingredient.objects.with_stock().annotate(
         stock_percentage=Case(
             When(reorder_level__gt=0, then=(
-                F('current_stock_qty') * 100 / F('reorder_level')
+                F('available_qty') * 100 / F('reorder_level')
             )),
             default=Value(100),
             output_field=FloatField()
         )
-    ).order_by('current_stock_qty')[:15]  # Top 15 to fit on page
+    ).order_by('available_qty')[:15]  # Top 15 to fit on page
     
     if all_ingredients:
         inv_data = [['Ingredient', 'Current Stock', 'Reorder Level', 'Status']]
         for ing in all_ingredients:
-            if ing.current_stock_qty < ing.safety_stock_qty:
+            if ing.available_qty < ing.safety_stock_qty:
                 status = 'Critical'
-            elif ing.current_stock_qty < ing.reorder_level:
+            elif ing.available_qty < ing.reorder_level:
                 status = 'Low Stock'
             else:
                 status = 'Healthy'
             
             inv_data.append([
                 ing.name,
-                f"{ing.current_stock_qty:.1f} {ing.unit_of_measure}",
+                f"{ing.on_hand_qty:.1f} {ing.unit_of_measure}",
                 f"{ing.reorder_level:.1f}",
                 status
             ])
@@ -711,8 +862,8 @@ def generate_report_pdf(request):
     elements.append(Spacer(1, 0.3*inch))
     
     # Low Stock Alerts
-    low_stock = Ingredient.objects.filter(
-        current_stock_qty__lt=F('reorder_level')
+    low_stock = Ingredient.objects.with_stock().filter(
+        available_qty__lt=F('reorder_level')
     ).count()
     
     elements.append(Paragraph(f"<b>Low Stock Alerts: {low_stock} items</b>", normal_style))
@@ -734,3 +885,13 @@ def generate_report_pdf(request):
     response.write(pdf)
     
     return response
+
+
+def metrics(request):
+    """Operational counters of this worker process, as JSON."""
+    return JsonResponse({
+        "bom_cache": bom.stats(),
+        "analytics_cache": analytics_cache.stats(),
+        "deduction_queue": pending_deduction_stats(),
+        "transaction_retries": retry.stats(),
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -123,3 +124,84 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+
+
+# Cache
+# The BOM and analytics caches invalidate through version keys in these
+# caches, so they must be shared by every worker process: the default
+# per-process LocMemCache would leave other workers with stale recipes and
+# pages. The file backend is shared by all workers on one host; point them
+# at Redis or Memcached when serving from several hosts.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / '.django_cache'),
+    },
+    # Holds only the analytics data-version key, so culling the page cache
+    # (MAX_ENTRIES) never evicts it.
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': str(BASE_DIR / '.django_cache' / 'versions'),
+        'TIMEOUT': None,
+    },
+}
+
+MINGOS_VERSION_CACHE = 'versions'
+
+
+# Mingos order path
+#
+# Whatever the mode below, every order adds itself to today's DailySales
+# rollup row (and its hour and item rows) inside its own transaction, so
+# concurrent orders queue on that row until each one commits. The deferred,
+# ledger and stripe modes keep Ingredient rows out of the order
+# transaction; they do not remove that rollup row contention.
+#
+# When True, placing an order only records PendingDeduction rows and the
+# `manage.py drain_deductions` worker applies them to Ingredient stock,
+# coalesced per ingredient. Keeps hot ingredient rows out of the order
+# transaction at the cost of stock figures lagging by one drain cycle.
+
+MINGOS_DEFERRED_DEDUCTION = False
+
+# When True, order deductions, purchase receipts and adjustments are
+# appended to StockLedgerEntry instead of updating Ingredient rows, and
+# `manage.py compact_stock_ledger` periodically folds the ledger into
+# Ingredient.current_stock_qty, so stock reads only sum the unfolded tail.
+# Takes precedence over MINGOS_DEFERRED_DEDUCTION.
+
+MINGOS_STOCK_LEDGER = False
+
+# Ingredients flagged `is_hot` are deducted through this many StockStripe
+# sub-counters (picked per worker process/thread) instead of their own
+# row; `manage.py fold_stock_stripes` merges them back periodically.
+
+MINGOS_STOCK_STRIPES = 8
+
+# When True, placing an order only reserves its ingredients
+# (Ingredient.reserved_stock_qty); stock is deducted when the order is
+# marked SERVED and released when it is CANCELLED. Takes precedence over
+# the deduction modes above, which then apply at serve time.
+
+MINGOS_RESERVE_STOCK = False
+
+# Days of history held by each worker's in-memory sales cube
+# (/analytics/cube/). Memory grows with menu items x days.
+
+MINGOS_SALES_CUBE_DAYS = 180
+
+# Days of projected ingredient use that suggested purchase orders
+# (`manage.py suggest_purchase_orders`) cover on top of reorder levels.
+
+MINGOS_PURCHASE_COVER_DAYS = 7
+
+# Seconds a worker keeps a compiled recipe (BOM) before re-reading it,
+# even if no invalidation reached it through the shared cache.
+
+MINGOS_BOM_TTL_SECONDS = 60
+
+# Shared secret POS terminals send in the X-Terminal-Token header to use
+# the JSON order endpoints; they refuse every request while it is empty.
+
+MINGOS_TERMINAL_TOKEN = os.environ.get('MINGOS_TERMINAL_TOKEN', '')